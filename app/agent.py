@@ -1,19 +1,44 @@
-from core import AgentState, Task, initialize_vertexai, find_next_available_slot, load_tasks, save_tasks, load_calendar, save_calendar
+from core import AgentState, Task, TaskStore, CalendarIndex, UserRegistry, UserSession, initialize_vertexai, schedule_day, FastIntentClassifier, IntentCache, LLMDispatcher, Lazy, PromptEngine, SuggestionCache, approx_tokens, serve_sync, logger, configure_logging, metrics, timed_node, record_llm_call, serve_stats, PeriodicTextfileExporter, enable_opentelemetry
 
+import asyncio
 import os
+import time
 import uuid
+import functools
 from datetime import datetime, timedelta
-from typing import TypedDict, List, Optional, Annotated
-from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain_core.messages import SystemMessage, HumanMessage, AIMessage
+from typing import TypedDict, List, Optional, Annotated, AsyncIterator
 from pydantic import BaseModel, Field
-from langgraph.graph import StateGraph, END
 
 
-# Load tasks and calendar and initialize llm at startup
-task_list = load_tasks()
-simulated_calendar = load_calendar()
-llm = initialize_vertexai()
+# Logs go through the leveled 'focusflow' logger (FOCUSFLOW_LOG_LEVEL, default WARNING)
+configure_logging()
+
+# Metrics exporters, each off unless configured:
+#   FOCUSFLOW_STATS_PORT      serves /metrics (Prometheus) and /stats (JSON) on localhost
+#   FOCUSFLOW_METRICS_FILE    rewrites a node_exporter textfile every FOCUSFLOW_METRICS_FILE_INTERVAL_S (15)
+#   FOCUSFLOW_OTLP_ENDPOINT   forwards observations to an OpenTelemetry collector
+if os.getenv("FOCUSFLOW_STATS_PORT"):
+    stats_server = serve_stats(int(os.environ["FOCUSFLOW_STATS_PORT"]))
+if os.getenv("FOCUSFLOW_METRICS_FILE"):
+    textfile_exporter = PeriodicTextfileExporter(os.environ["FOCUSFLOW_METRICS_FILE"],
+                                                 float(os.getenv("FOCUSFLOW_METRICS_FILE_INTERVAL_S", "15"))).start()
+if os.getenv("FOCUSFLOW_OTLP_ENDPOINT"):
+    enable_opentelemetry(os.environ["FOCUSFLOW_OTLP_ENDPOINT"])
+
+# Per-user tasks and calendars are loaded on a user's first request (keyed by state['user_id'])
+user_registry = UserRegistry()
+# Set FOCUSFLOW_SYNC_PORT to serve the React UI's task sync API over these same sessions (on localhost).
+# The API trusts the user id in its paths, so FOCUSFLOW_SYNC_ORIGIN, the UI's exact origin, is required:
+# browser requests from any other origin are refused.
+if os.getenv("FOCUSFLOW_SYNC_PORT"):
+    if not os.getenv("FOCUSFLOW_SYNC_ORIGIN"):
+        raise RuntimeError("FOCUSFLOW_SYNC_PORT is set but FOCUSFLOW_SYNC_ORIGIN (the React UI's origin) is not")
+    sync_server = serve_sync(user_registry, int(os.environ["FOCUSFLOW_SYNC_PORT"]),
+                             allowed_origin=os.environ["FOCUSFLOW_SYNC_ORIGIN"])
+# The llm client is built on the first request that needs it, then reused
+llm = Lazy(initialize_vertexai)
+# Resolves simple intents locally so they don't pay for an LLM call
+intent_classifier = FastIntentClassifier()
 
 # Pydantic Models for LLM Structured Output
 class ParsedTaskInfo(BaseModel):
@@ -24,163 +49,303 @@ class ParsedTaskInfo(BaseModel):
 
 class UserIntent(BaseModel):
     """The user's intent and any extracted task details."""
-    intent: str = Field(..., description="Classify the user's primary goal. Options: 'add_task', 'suggest_task', 'list_tasks', 'complete_task', 'greet', 'goodbye', 'unknown'.")
+    intent: str = Field(..., description="Classify the user's primary goal. Options: 'add_task', 'suggest_task', 'list_tasks', 'complete_task', 'plan_day', 'greet', 'goodbye', 'unknown'.")
     task_info: Optional[ParsedTaskInfo] = Field(None,description="Details of the task if intent is 'add_task'.")
     task_description_to_complete: Optional[str] = Field(None,description="The description or part of the description of the task to mark as complete, if intent is 'complete_task'.")
 
-# Langraph Agent Node Functions
-
-def parse_user_input(state: AgentState) -> AgentState:
-    """
-    Uses LLM to understand user input, classify intent, and extract task details.
-    Crucially, if priority or estimated time are not provided by the user for 
-    'add_task' intent, the LLM is instructed to estimate them.
-    """
-    print("--- Node: parse_user_input ---")
-    
-    #Direct Command Check
-    # If task_id_to_complete is provided in the input state, bypass LLM
-    task_id = state.get('task_id_to_complete')
-    if task_id:
-        print(f"Direct command received: Complete task ID {task_id}")
-        state['intent'] = 'complete_task_by_id'
-        state['user_input'] = None # Clear user text input if processing direct command
-        state['error'] = None
-        return state
-    
-    if not llm:
-        state['error'] = "LLM not configured. Cannot parse input."
-        state['intent'] = "unknown"
-        state['response'] = state['error']
-        return state
-
-    user_input = state['user_input']
-    structured_llm = llm.with_structured_output(UserIntent)
-
-    
-    prompt = f"""Analyze the user's request regarding their todo list and calendar.
-
-User Request: "{user_input}"
-
-Today's Date: {datetime.now().strftime('%Y-%m-%d')}
-Current Time: {datetime.now().strftime('%H:%M')} (Location: Seattle, WA, USA)
+# Set FOCUSFLOW_INTENT_CACHE_PATH to keep cached LLM parses across restarts
+intent_cache_path = os.getenv("FOCUSFLOW_INTENT_CACHE_PATH")
+intent_cache = IntentCache(UserIntent, path=intent_cache_path)
 
+# The intent prompt. Instructions plus examples are compiled once per tier into a fixed system
+# message; only INTENT_REQUEST is rendered per call.
+INTENT_INSTRUCTIONS = """Analyze the user's request regarding their todo list and calendar. Each message gives the User Request, today's date and the current time.
 
 Following UserIntent schema, extract from the User Request:
-intent: one of 'add_task', 'suggest_task', 'list_tasks', 'complete_task', 'greet', 'goodbye', 'unknown'.
+intent: one of 'add_task', 'suggest_task', 'list_tasks', 'complete_task', 'plan_day', 'greet', 'goodbye', 'unknown'.
 
-task_info: 
+task_info:
     IF intent is 'add_task' you MUST populate 'task_info' field with a ParsedTaskInfo JSON object:
         description: From the User Request, extract/infer the core task as a to-do list item.
-        priority: From the User Request, estimate the task's priority as an integer from 1 to 5, 1 is highest priority, 5 is the lowest priority. 
+        priority: From the User Request, estimate the task's priority as an integer from 1 to 5, 1 is highest priority, 5 is the lowest priority.
         estimated_time_minutes: From the User Request, estimate the time in minutes required to complete the task (integer).
-        
-        EXAMPLES: 
-            If user_input is 'Prepare Q2 reports', ParsedTaskInfo is {{description:'Prepare Q2 reports',priority:2,estimated_time_minutes:180}} 
-            If user_input is 'Help me remember the laundry needs folding', ParsedTaskInfo is {{description:'Fold laundry',priority:5,estimated_time_minutes:30}} 
-            If user_input is 'I need to remember to send the card to Aunt Susie', ParsedTaskInfo is {{description:'Send card to Aunt Susie',priority:2,estimated_time_minutes:5}}
-            If user_input is 'I want to send Aunt Susie a card'ParsedTaskInfo is {{description:'Send card to Aunt Susie',priority:3,estimated_time_minutes:30}} 
-        (Notice that the last two have the same core description but because the first implied that the card was ready to be sent the time estimated was minimal and priority was increased, whereas the second implied that the card had probably not yet been purchased or written in, so a longer time would be estimated and middling priority inferred.)
-        
-        ELSE task_info defaults to null
+        (See the ParsedTaskInfo EXAMPLES below.)
+    ELSE task_info defaults to null
 
 task_description_to_complete:
     IF intent is 'complete_task':
-        Extract the description (or keywords) of the task the user wants to complete into the `` field.
+        Extract the description (or keywords) of the task the user wants to complete into the `task_description_to_complete` field.
     ELSE task_description_to_complete defaults to null
 
-Double-check - IF intent is add_task AND task_info is null THEN refer back to task_info instructions to populate the field correctly. 
+Double-check - IF intent is add_task AND task_info is null THEN refer back to task_info instructions to populate the field correctly.
 
 Respond ONLY with the structured JSON output matching the UserIntent schema. Do not add explanations.
 
-Example response:{{
+Example response:{
                     "intent": "add_task",
-                    "task_info": {{
+                    "task_info": {
                                 "description": "Buy groceries for dinner",
                                 "priority": 2,
                                 "estimated_time_minutes": 30
-                                }},
+                                },
                     "task_description_to_complete": null
-                    }}
-"""
+                    }"""
+
+INTENT_EXAMPLES = {
+    "full": """ParsedTaskInfo EXAMPLES:
+    If user_input is 'Prepare Q2 reports', ParsedTaskInfo is {description:'Prepare Q2 reports',priority:2,estimated_time_minutes:180}
+    If user_input is 'Help me remember the laundry needs folding', ParsedTaskInfo is {description:'Fold laundry',priority:5,estimated_time_minutes:30}
+    If user_input is 'I need to remember to send the card to Aunt Susie', ParsedTaskInfo is {description:'Send card to Aunt Susie',priority:2,estimated_time_minutes:5}
+    If user_input is 'I want to send Aunt Susie a card' ParsedTaskInfo is {description:'Send card to Aunt Susie',priority:3,estimated_time_minutes:30}
+(Notice that the last two have the same core description but because the first implied that the card was ready to be sent the time estimated was minimal and priority was increased, whereas the second implied that the card had probably not yet been purchased or written in, so a longer time would be estimated and middling priority inferred.)""",
+    # Short single-clause requests don't need the worked nuance of the full set
+    "lite": """ParsedTaskInfo EXAMPLES:
+    If user_input is 'Prepare Q2 reports', ParsedTaskInfo is {description:'Prepare Q2 reports',priority:2,estimated_time_minutes:180}
+    If user_input is 'Help me remember the laundry needs folding', ParsedTaskInfo is {description:'Fold laundry',priority:5,estimated_time_minutes:30}""",
+}
+
+INTENT_REQUEST = """User Request: "{request}"
+
+Today's Date: {date}
+Current Time: {time} (Location: Seattle, WA, USA)"""
+
+intent_prompts = PromptEngine(INTENT_INSTRUCTIONS, INTENT_EXAMPLES, INTENT_REQUEST,
+                              max_request_tokens=int(os.getenv("FOCUSFLOW_MAX_REQUEST_TOKENS", "256")))
+
+# Intent parsing runs on one model per prompt tier: simple requests use the lite tier on
+# FOCUSFLOW_LITE_MODEL (set it to FOCUSFLOW_INTENT_MODEL to use one model for both).
+INTENT_MODELS = {"full": os.getenv("FOCUSFLOW_INTENT_MODEL", "gemini-1.5-pro"),
+                 "lite": os.getenv("FOCUSFLOW_LITE_MODEL", "gemini-1.5-flash")}
+
+def _structured_intent_llm(tier: str):
+    # include_raw keeps the raw message so token usage can be recorded
+    model = intent_models[tier].get()
+    return model.with_structured_output(UserIntent, include_raw=True) if model else None
+
+intent_models = {tier: Lazy(functools.partial(initialize_vertexai, model_name)) for tier, model_name in INTENT_MODELS.items()}
+# Structured-output wrappers, built on first use (None if the llm isn't configured)
+structured_llms = {tier: Lazy(functools.partial(_structured_intent_llm, tier)) for tier in INTENT_MODELS}
+
+# Every parse call goes through its tier's dispatcher: micro-batched, rate limited and bounded in flight.
+# Vertex AI quotas are per model, so each tier gets the full FOCUSFLOW_LLM_RATE (requests per second).
+llm_dispatchers = {tier: LLMDispatcher(structured_llms[tier].get,
+                                       max_concurrency=int(os.getenv("FOCUSFLOW_LLM_MAX_CONCURRENCY", "8")),
+                                       rate_per_second=float(os.getenv("FOCUSFLOW_LLM_RATE", "10")),
+                                       batch_window_ms=float(os.getenv("FOCUSFLOW_LLM_BATCH_WINDOW_MS", "5")))
+                   for tier in INTENT_MODELS}
+
+# Cache/index stats are pulled by the metrics exporters
+metrics.register_collector("focusflow_intent_cache", intent_cache.stats)
+metrics.register_collector("focusflow_fast_intent", intent_classifier.stats)
+for tier, dispatcher in llm_dispatchers.items():
+    metrics.register_collector(f"focusflow_llm_dispatcher_{tier}", dispatcher.stats)
+metrics.register_collector("focusflow_intent_prompt", intent_prompts.stats)
+metrics.register_collector("focusflow_user_sessions", lambda: {"loaded": len(user_registry)})
+
+def _parsed_llm_output(output: dict, started: float, tier: str) -> UserIntent:
+    """Records the call's latency and token usage, then returns the parsed UserIntent."""
+    usage = getattr(output.get('raw'), 'usage_metadata', None) or {}
+    record_llm_call(time.perf_counter() - started, usage.get('input_tokens'), usage.get('output_tokens'),
+                    model_tier=tier, cached_tokens=(usage.get('input_token_details') or {}).get('cache_read'))
+    if output.get('parsing_error'):
+        raise output['parsing_error']
+    return output['parsed']
 
+# Langraph Agent Node Functions
 
-    try:
-        result = structured_llm.invoke(prompt)
-        print(f"LLM Parsing Result: {result}")
-
-        # Update state with parsed info
-        state['intent'] = result.intent
-        state['extracted_task_info'] = result.task_info.dict() if result.task_info else None
-        state['error'] = None # Clear previous error
-        
-# Handle LLM-based completion intent (user typed "complete...")
-        if result.intent == 'complete_task' and result.task_description_to_complete:
-            found = False
-            task_description_lower = result.task_description_to_complete.lower()
-            for i, task in enumerate(task_list):
-                if not task.completed and task_description_lower in task.description.lower():
-                    # Instead of completing here, set the ID for the dedicated node
-                    state['task_id_to_complete'] = task.id
-                    state['intent'] = 'complete_task_by_id' # Route to the ID completion node
-                    print(f"LLM identified task '{task.description}' (ID: {task.id}) for completion.")
-                    found = True
-                    break
-            if not found:
-                state['response'] = f"Sorry, I couldn't find an active task matching '{result.task_description_to_complete}' based on your text."
-                print(f"Task completion failed: No match for '{result.task_description_to_complete}'")
-                state['intent'] = 'info_provided' # Go to format response directly
-
-        elif result.intent == 'list_tasks':
-            # (Logic remains the same)
-            active_tasks = [t for t in task_list if not t.completed]
-            if not active_tasks: state['response'] = "Your task list is empty!"
-            else:
-                lines = ["Here are your active tasks:"] + [f"- {t.description} (P{t.priority}, {t.estimated_time_minutes} min)" for t in sorted(active_tasks, key=lambda t: (t.priority, t.added_at))]
-                state['response'] = "\n".join(lines)
+def with_user_session(node):
+    """Runs a node with the requesting user's session locked, passing it as the second argument."""
+    @functools.wraps(node)
+    def wrapper(state: AgentState) -> AgentState:
+        with user_registry.locked(state.get('user_id')) as session:
+            return node(state, session)
+    return wrapper
+
+def list_tasks_response(task_store: TaskStore) -> str:
+    active_rows = task_store.active_rows() # Already ordered by (priority, added_at)
+    if not active_rows:
+        return "Your task list is empty!"
+    lines = ["Here are your active tasks:"] + [f"- {description} (P{priority}, {estimate} min)" for _, description, priority, estimate in active_rows]
+    return "\n".join(lines)
+
+def _parse_without_llm(state: AgentState, task_store: TaskStore) -> bool:
+    """Handles direct commands and fast-path intents. Returns True if the LLM is not needed."""
+    #Direct Command Check
+    # If task_id_to_complete is provided in the input state, bypass LLM
+    task_id = state.get('task_id_to_complete')
+    if task_id:
+        logger.info("Direct command received: Complete task ID %s", task_id)
+        state['intent'] = 'complete_task_by_id'
+        state['user_input'] = None # Clear user text input if processing direct command
+        state['error'] = None
+        return True
+
+    #Fast Path Check
+    # Simple intents (greetings, listing, suggestions, exact-match completions) are resolved without the LLM
+    fast_intent = intent_classifier.classify(state.get('user_input'), task_store)
+    if fast_intent:
+        logger.info("Fast-path intent: %s (%s)", fast_intent.intent, fast_intent.source)
+        state['intent'] = fast_intent.intent
+        state['extracted_task_info'] = None
+        state['error'] = None
+        if fast_intent.intent == 'complete_task':
+            state['task_id_to_complete'] = fast_intent.task_id_to_complete
+            state['intent'] = 'complete_task_by_id'
+        elif fast_intent.intent == 'list_tasks':
+            state['response'] = list_tasks_response(task_store)
             state['intent'] = 'info_provided'
+        return True
+    return False
 
-    except Exception as e:
-        # (Error handling remains similar)
-        print(f"Error parsing input with LLM: {e}")
-        error_message = f"Sorry, I had trouble understanding or processing that. Please try rephrasing. (Error detail: {e})"
-        if "validation error" in str(e).lower(): error_message = f"Sorry, I couldn't extract valid task details... (Error detail: {e})"
-        state['intent'] = "unknown"
-        state['extracted_task_info'] = None
-        state['error'] = error_message
-        state['response'] = state['error']
-        
-    # Add a check here: If intent is add_task, ensure task_info is present AND has the required fields
+def _llm_not_configured(state: AgentState) -> AgentState:
+    state['error'] = "LLM not configured. Cannot parse input."
+    state['intent'] = "unknown"
+    state['response'] = state['error']
+    return state
+
+def _apply_intent_result(state: AgentState, result: UserIntent, task_store: TaskStore):
+    """Updates state with the parsed intent and resolves list/complete requests."""
+    # Update state with parsed info
+    state['intent'] = result.intent
+    state['extracted_task_info'] = result.task_info.dict() if result.task_info else None
+    state['error'] = None # Clear previous error
+
+    # Handle LLM-based completion intent (user typed "complete...")
+    if result.intent == 'complete_task' and result.task_description_to_complete:
+        match = task_store.match_description(result.task_description_to_complete)
+        metrics.inc("focusflow_task_match_total", outcome="matched" if match.best else "ambiguous" if match.ambiguous else "none")
+        if match.best:
+            # Instead of completing here, set the ID for the dedicated node
+            state['task_id_to_complete'] = match.best.task_id
+            state['intent'] = 'complete_task_by_id' # Route to the ID completion node
+            logger.info("LLM identified task '%s' (ID: %s, score %s) for completion.", match.best.description, match.best.task_id, match.best.score)
+        elif match.ambiguous:
+            # Several tasks match about equally well; ask rather than completing the wrong one
+            lines = [f"More than one task matches '{result.task_description_to_complete}'. Which one did you mean?"] + [
+                f"- {candidate.description}" for candidate in match.candidates]
+            state['response'] = "\n".join(lines)
+            logger.info("Task completion ambiguous: %s", [candidate.description for candidate in match.candidates])
+            state['intent'] = 'info_provided' # Go to format response directly
+        else:
+            state['response'] = f"Sorry, I couldn't find an active task matching '{result.task_description_to_complete}' based on your text."
+            logger.info("Task completion failed: No match for '%s'", result.task_description_to_complete)
+            state['intent'] = 'info_provided' # Go to format response directly
+
+    elif result.intent == 'list_tasks':
+        state['response'] = list_tasks_response(task_store)
+        state['intent'] = 'info_provided'
+
+def _handle_parse_error(state: AgentState, e: Exception):
+    logger.warning("Error parsing input with LLM: %s", e)
+    error_message = f"Sorry, I had trouble understanding or processing that. Please try rephrasing. (Error detail: {e})"
+    if "validation error" in str(e).lower(): error_message = f"Sorry, I couldn't extract valid task details... (Error detail: {e})"
+    state['intent'] = "unknown"
+    state['extracted_task_info'] = None
+    state['error'] = error_message
+    state['response'] = state['error']
+
+def _check_add_task_info(state: AgentState):
+    # If intent is add_task, ensure task_info is present AND has the required fields
     if state['intent'] == 'add_task' and (not state['extracted_task_info'] or
                                         'description' not in state['extracted_task_info'] or
                                         'priority' not in state['extracted_task_info'] or
                                         'estimated_time_minutes' not in state['extracted_task_info']):
-        print(f"Error: LLM intended 'add_task' but failed to provide complete task_info: {state['extracted_task_info']}")
+        logger.warning("LLM intended 'add_task' but failed to provide complete task_info: %s", state['extracted_task_info'])
         state['error'] = "I understood you want to add a task, but I couldn't determine all the necessary details (description, priority, time). Please try adding the task again with more specifics."
         state['response'] = state['error']
         # Override intent to prevent routing to add_task_to_list with incomplete data
         state['intent'] = 'error_handled'
 
+def _parse_locally(state: AgentState) -> bool:
+    with user_registry.locked(state.get('user_id')) as session:
+        return _parse_without_llm(state, session.tasks)
+
+def _apply_intent_result_locked(state: AgentState, result: UserIntent):
+    with user_registry.locked(state.get('user_id')) as session:
+        _apply_intent_result(state, result, session.tasks)
+
+@timed_node("parse_user_input")
+def parse_user_input(state: AgentState) -> AgentState:
+    """
+    Uses LLM to understand user input, classify intent, and extract task details.
+    Crucially, if priority or estimated time are not provided by the user for 
+    'add_task' intent, the LLM is instructed to estimate them.
+    """
+    logger.debug("--- Node: parse_user_input ---")
+    # The user's lock is held around store access only, never across the LLM call
+    if _parse_locally(state):
+        return state
+
+    user_input = state['user_input']
+    cache_key = intent_cache.make_key(user_input, datetime.now().date())
+    try:
+        result = intent_cache.get(cache_key)
+        if result is None:
+            prompt = intent_prompts.render(user_input)
+            if structured_llms[prompt.tier].get() is None:
+                return _llm_not_configured(state)
+            started = time.perf_counter()
+            result = _parsed_llm_output(llm_dispatchers[prompt.tier].invoke(prompt.messages), started, prompt.tier)
+            intent_cache.put(cache_key, result)
+            logger.info("LLM Parsing Result: %s", result)
+        else:
+            logger.info("Cached Parsing Result: %s", result)
+        _apply_intent_result_locked(state, result)
+    except Exception as e:
+        _handle_parse_error(state, e)
+
+    _check_add_task_info(state)
+    return state
+
+@timed_node("parse_user_input")
+async def aparse_user_input(state: AgentState) -> AgentState:
+    """Async version of parse_user_input: awaits the LLM instead of blocking the event loop."""
+    logger.debug("--- Node: parse_user_input (async) ---")
+    # Loading the session (a journal replay on the user's first turn) and waiting for its lock
+    # happen on a worker thread so they don't stall other conversations on the event loop
+    if await asyncio.to_thread(_parse_locally, state):
+        return state
+
+    user_input = state['user_input']
+    cache_key = intent_cache.make_key(user_input, datetime.now().date())
+    try:
+        result = intent_cache.get(cache_key)
+        if result is None:
+            prompt = intent_prompts.render(user_input)
+            # The first call per tier imports the Gemini SDK and reads credentials; keep that off the event loop
+            if await structured_llms[prompt.tier].aget() is None:
+                return _llm_not_configured(state)
+            started = time.perf_counter()
+            result = _parsed_llm_output(await llm_dispatchers[prompt.tier].ainvoke(prompt.messages), started, prompt.tier)
+            intent_cache.put(cache_key, result)
+            logger.info("LLM Parsing Result: %s", result)
+        else:
+            logger.info("Cached Parsing Result: %s", result)
+        await asyncio.to_thread(_apply_intent_result_locked, state, result)
+    except Exception as e:
+        _handle_parse_error(state, e)
 
+    _check_add_task_info(state)
     return state
 
 #Complete task
-def complete_task_by_id(state: AgentState) -> AgentState:
+@timed_node("complete_task_by_id")
+@with_user_session
+def complete_task_by_id(state: AgentState, session: UserSession) -> AgentState:
     """Marks a task as complete using its ID stored in the state."""
-    print("--- Node: complete_task_by_id ---")
+    logger.debug("--- Node: complete_task_by_id ---")
+    task_store = session.tasks
     task_id = state.get('task_id_to_complete')
     found = False
     if task_id:
-        for i, task in enumerate(task_list):
-            if task.id == task_id and not task.completed:
-                task_list[i].completed = True
-                print(f"Task marked complete by ID: {task_id} ({task.description})")
-                # Set a temporary confirmation message; the final response will come after re-suggestion
-                state['response'] = f"Marked '{task.description}' as complete."
-                found = True
-                break
+        task = task_store.complete(task_id)
+        if task:
+            logger.info("Task marked complete by ID: %s (%s)", task_id, task.description)
+            # Set a temporary confirmation message; the final response will come after re-suggestion
+            state['response'] = f"Marked '{task.description}' as complete."
+            found = True
     if not found:
-        print(f"Error: Task ID {task_id} not found or already completed.")
+        logger.warning("Task ID %s not found or already completed.", task_id)
         state['error'] = f"Could not mark task as complete (ID: {task_id}). It might not exist or is already done."
         state['response'] = state['error']
         # If completion fails, maybe don't suggest? Go to format response.
@@ -194,9 +359,12 @@ def complete_task_by_id(state: AgentState) -> AgentState:
     return state
 
 #Add a task
-def add_task_to_list(state: AgentState) -> AgentState:
+@timed_node("add_task_to_list")
+@with_user_session
+def add_task_to_list(state: AgentState, session: UserSession) -> AgentState:
     """Adds the extracted task details (potentially estimated) to the persistent task list."""
-    print("--- Node: add_task_to_list ---")
+    logger.debug("--- Node: add_task_to_list ---")
+    task_store = session.tasks
     if state.get('extracted_task_info'):
         try:
             task_info = state['extracted_task_info']
@@ -215,8 +383,8 @@ def add_task_to_list(state: AgentState) -> AgentState:
                 priority=int(priority), # Ensure integer
                 estimated_time_minutes=int(estimate), # Ensure integer
             )
-            task_list.append(new_task) # Append to the global list
-            print(f"Task Added: {new_task}")
+            task_store.add(new_task) # Add to the user's store (indexes update incrementally)
+            logger.info("Task Added: %s", new_task)
 
             # Include estimated values in confirmation if they were estimated
             # (We don't explicitly know if they were estimated vs user-provided here,
@@ -224,19 +392,19 @@ def add_task_to_list(state: AgentState) -> AgentState:
             state['response'] = (f"Okay, I've added '{new_task.description}' "
                                     f"(Priority {new_task.priority}, "
                                     f"{new_task.estimated_time_minutes} min) to your list.")
-            print(state['response'])
+            logger.debug(state['response'])
 
             state['intent'] = 'suggest_task_after_add' # Route to suggestion node next
             state['error'] = None # Clear any previous errors if adding succeeds
 
         except Exception as e:
-            print(f"Error creating or adding task object: {e}")
+            logger.warning("Error creating or adding task object: %s", e)
             state['error'] = f"There was an issue processing the task details: {e}"
             state['response'] = state['error']
             state['intent'] = 'error_handled' # Indicate error occurred
     else:
         # This path should ideally not be reached due to checks in parse_user_input
-        print("Error: Add task node reached without extracted_task_info.")
+        logger.error("Add task node reached without extracted_task_info.")
         state['error'] = "Tried to add a task, but no task information was found in the state."
         state['response'] = "Something went wrong - I didn't have the task details to add."
         state['intent'] = 'error_handled'
@@ -245,31 +413,24 @@ def add_task_to_list(state: AgentState) -> AgentState:
 
 
 # Helper Function: find_next_available_slot
-def find_next_available_slot(current_time: datetime = None) -> dict:
+def find_next_available_slot(calendar_index: CalendarIndex, current_time: datetime = None) -> dict:
     """
-    Finds the next free time slot based on the simulated calendar.
+    Finds the next free time slot based on the calendar index.
     Returns a dictionary with 'free_from', 'free_until', 'free_duration_minutes', 'transition_reason'.
-    (Code remains the same as previous version)
+    Overlapping and back-to-back events are already merged into busy blocks by the index.
     """
-    print("--- Helper: find_next_available_slot ---")
+    logger.debug("--- Helper: find_next_available_slot ---")
     if current_time is None:
         current_time = datetime.now() # Use actual current time for calculations
 
-    sorted_events = sorted(simulated_calendar, key=lambda x: x.start_time)
-    busy_until = current_time
-    for event in sorted_events:
-        if event.start_time <= current_time < event.end_time:
-            busy_until = event.end_time
-            print(f"Currently busy until {busy_until.strftime('%H:%M')} due to '{event.summary}'")
-            break
+    busy_until, next_block = calendar_index.free_window_at(current_time)
+    if busy_until > current_time:
+        logger.debug("Currently busy until %s due to '%s'", busy_until, calendar_index.block_at(current_time)[2])
     next_event_start = None
     next_event_summary = "end of known schedule"
-    for event in sorted_events:
-        if event.start_time >= busy_until:
-            next_event_start = event.start_time
-            next_event_summary = event.summary
-            print(f"Next event found: '{next_event_summary}' starting at {next_event_start.strftime('%H:%M')}")
-            break
+    if next_block:
+        next_event_start, _, next_event_summary = next_block
+        logger.debug("Next event found: '%s' starting at %s", next_event_summary, next_event_start)
     if next_event_start:
         free_duration = next_event_start - busy_until
         free_duration_minutes = int(free_duration.total_seconds() / 60)
@@ -282,14 +443,14 @@ def find_next_available_slot(current_time: datetime = None) -> dict:
             free_duration_minutes = int(free_duration.total_seconds() / 60)
             next_transition_time = end_of_day
             transition_reason = "until end of workday (assumed 5 PM)"
-            print(f"No further events, assuming free until end of day {next_transition_time.strftime('%H:%M')}")
+            logger.debug("No further events, assuming free until end of day %s", next_transition_time)
         else:
             free_duration_minutes = 0
             next_transition_time = busy_until
             transition_reason = "as the workday is over or you're busy until then"
-            print(f"Busy until {busy_until.strftime('%H:%M')}, which is at or after assumed end of day.")
+            logger.debug("Busy until %s, which is at or after assumed end of day.", busy_until)
 
-    print(f"Slot Calculation: Free From={busy_until.strftime('%H:%M')}, Free Until={next_transition_time.strftime('%H:%M')}, Duration={max(0, free_duration_minutes)} min")
+    logger.debug("Slot Calculation: Free From=%s, Free Until=%s, Duration=%s min", busy_until, next_transition_time, max(0, free_duration_minutes))
     return {
         "free_from": busy_until,
         "free_until": next_transition_time,
@@ -300,26 +461,63 @@ def find_next_available_slot(current_time: datetime = None) -> dict:
 
 
 #suggest_task
-def suggest_task(state: AgentState) -> AgentState:
+MIN_TASK_TIME_THRESHOLD = 5
+
+def _plan_suggestion(session: UserSession, now: datetime):
+    """
+    Computes the free slot and best-fitting task at `now`, plus the time until which
+    that plan holds: the end of the busy block we're in, or the moment the shrinking
+    free window no longer fits the suggested task (or the minimum task time).
+    """
+    slot_info = find_next_available_slot(session.calendar, now)
+    available_minutes = slot_info['free_duration_minutes']
+    best_task = session.tasks.best_fit(available_minutes) if available_minutes >= MIN_TASK_TIME_THRESHOLD else None
+    if slot_info['free_from'] > now:
+        valid_until = slot_info['free_from']
+    elif slot_info['free_until'] <= now:
+        # Workday is over: nothing changes until tomorrow
+        valid_until = datetime.combine(now.date() + timedelta(days=1), datetime.min.time())
+    elif available_minutes < MIN_TASK_TIME_THRESHOLD:
+        valid_until = slot_info['free_until']
+    else:
+        needed = max(best_task.estimated_time_minutes, MIN_TASK_TIME_THRESHOLD) if best_task else MIN_TASK_TIME_THRESHOLD
+        valid_until = slot_info['free_until'] - timedelta(minutes=needed)
+    return (slot_info, best_task), valid_until
+
+def _slot_at(slot_info: dict, computed_at: datetime, now: datetime) -> dict:
+    """Brings a cached slot up to `now`: while free, the window starts now and shrinks as time passes."""
+    if slot_info['free_from'] > computed_at or now == computed_at:
+        return slot_info
+    if slot_info['free_until'] <= computed_at:
+        return {**slot_info, 'free_from': now, 'free_until': now}
+    return {**slot_info, 'free_from': now,
+            'free_duration_minutes': max(0, int((slot_info['free_until'] - now).total_seconds() / 60))}
+
+def _suggestion_cache(session: UserSession) -> SuggestionCache:
+    if session.suggestions is None:
+        session.suggestions = SuggestionCache(functools.partial(_plan_suggestion, session),
+                                              session.tasks, session.calendar, session.lock)
+    return session.suggestions
+
+@timed_node("suggest_task")
+@with_user_session
+def suggest_task(state: AgentState, session: UserSession) -> AgentState:
     """Suggests the best task based on priority, time estimate, and availability."""
-    print("--- Node: suggest_task ---")
+    logger.debug("--- Node: suggest_task ---")
+    task_store = session.tasks
     current_time = datetime.now() # Use real time now
-    slot_info = find_next_available_slot(current_time)
+    # Precomputed per session; recomputed only after task/calendar changes or when the free window moves on
+    (slot_info, best_task), computed_at = _suggestion_cache(session).get(current_time)
+    slot_info = _slot_at(slot_info, computed_at, current_time)
     state['next_event_info'] = slot_info # Store for potential UI display
     available_minutes = slot_info['free_duration_minutes']
-    min_task_time_threshold = 5
-    if available_minutes < min_task_time_threshold:
+    if available_minutes < MIN_TASK_TIME_THRESHOLD:
         state['suggestion'] = None
         state['response'] = f"You only have about {available_minutes} min free {slot_info['transition_reason']}. Not enough time for most tasks. Maybe take a quick break?"
         state['intent'] = 'info_provided'
         return state
-    eligible_tasks = [
-        task for task in task_list
-        if not task.completed and task.estimated_time_minutes <= available_minutes
-    ]
-    if not eligible_tasks:
-        active_tasks_exist = any(not task.completed for task in task_list)
-        if active_tasks_exist:
+    if best_task is None:
+        if task_store.has_active():
             state['suggestion'] = None
             state['response'] = f"You have {available_minutes} minutes free {slot_info['transition_reason']}, but none of your active tasks are estimated to fit in this time slot. Consider working on a smaller part of a task, or adding a smaller task."
         else:
@@ -327,28 +525,60 @@ def suggest_task(state: AgentState) -> AgentState:
             state['response'] = f"You have {available_minutes} minutes free {slot_info['transition_reason']} and your task list is empty! 🎉"
         state['intent'] = 'info_provided'
         return state
-    eligible_tasks.sort(key=lambda t: (t.priority, t.estimated_time_minutes))
-    best_task = eligible_tasks[0]
     state['suggestion'] = best_task
     state['response'] = (f"Given you have {available_minutes} minutes free {slot_info['transition_reason']}, "
                             f"I suggest working on:\n"
                             f"**Task:** '{best_task.description}'\n"
                             f"**(Priority {best_task.priority}, estimated {best_task.estimated_time_minutes} min)**")
     state['intent'] = 'info_provided'
-    print(f"Suggested Task: {best_task.description}")
+    logger.info("Suggested Task: %s", best_task.description)
+    return state
+
+
+#plan_day
+@timed_node("plan_day")
+@with_user_session
+def plan_day(state: AgentState, session: UserSession) -> AgentState:
+    """Schedules as many active tasks as fit into the rest of today's free windows, in one pass."""
+    logger.debug("--- Node: plan_day ---")
+    task_store, calendar_index = session.tasks, session.calendar
+    current_time = datetime.now()
+    windows = calendar_index.free_windows(current_time.date(), start=current_time)
+    # Only tasks that fit the largest window are candidates; they're built lazily as the planner consumes them
+    longest = max((int((end - start).total_seconds() / 60) for start, end in windows), default=0)
+    schedule = schedule_day(task_store.iter_active_by_priority(longest), windows)
+    state['schedule'] = schedule
+    if not schedule:
+        if not task_store.has_active():
+            state['response'] = "Your task list is empty, so there's nothing to plan today! 🎉"
+        elif not windows:
+            state['response'] = "You don't have any free time left in today's workday."
+        else:
+            state['response'] = "None of your active tasks fit into today's remaining free time."
+    else:
+        lines = ["Here's your plan for the rest of today:"] + [
+            f"- {item.start_time.strftime('%H:%M')}-{item.end_time.strftime('%H:%M')}: {item.description} (P{item.priority}, {item.estimated_time_minutes} min)"
+            for item in schedule]
+        unscheduled = task_store.active_count() - len(schedule)
+        if unscheduled:
+            lines.append(f"({unscheduled} task(s) didn't fit today.)")
+        state['response'] = "\n".join(lines)
+    state['intent'] = 'info_provided'
+    logger.info("Planned %d task(s) across %d free window(s)", len(schedule), len(windows))
     return state
 
 
 #format_response
+@timed_node("format_response")
 def format_response(state: AgentState) -> AgentState:
     """Prepares the final response string for the user, handling various intents and errors."""
-    print("--- Node: format_response ---")
+    logger.debug("--- Node: format_response ---")
     if state.get('error'):
         state['response'] = f"Error: {state['error']}"
-        print(f"Final Response (Error): {state['response']}")
+        logger.debug("Final Response (Error): %s", state['response'])
         return state
     if state.get('response'):
-        print(f"Final Response (Pre-set): {state['response']}")
+        logger.debug("Final Response (Pre-set): %s", state['response'])
         return state
     intent = state.get('intent', 'unknown')
     if intent == 'greet':
@@ -359,5 +589,39 @@ def format_response(state: AgentState) -> AgentState:
         state['response'] = "Sorry, I'm not sure how to handle that request. You can ask me to 'add task [details]', 'suggest a task', 'list tasks', or 'complete task [description]'."
     else:
         state['response'] = "Okay."
-    print(f"Final Response (Formatted): {state['response']}")
+    logger.debug("Final Response (Formatted): %s", state['response'])
     return state
+
+
+#Free-text replies
+def build_free_text_prompt(user_input: str) -> str:
+    return f"""You are FocusFlow, a friendly assistant that helps people manage their to-do list and calendar.
+The user said: "{user_input}"
+Reply briefly and conversationally (two sentences at most). If the request isn't about their tasks,
+gently mention that you can add tasks, suggest what to work on next, list tasks, plan their day, or mark tasks complete."""
+
+async def astream_free_text_reply(user_input: str) -> AsyncIterator[str]:
+    """Streams a free-text reply from the llm chunk by chunk. Yields nothing if the llm isn't configured."""
+    client = await llm.aget()
+    if client is None:
+        return
+    prompt = build_free_text_prompt(user_input)
+    usage = {'input_tokens': 0, 'output_tokens': 0}
+    # The free-text client is the full tier's (pro) model, so streams share that tier's rate limit and in-flight cap
+    async with llm_dispatchers["full"].aslot():
+        started = time.perf_counter()
+        try:
+            async for chunk in client.astream(prompt):
+                # Chunks carry usage deltas (LangChain sums them when merging chunks), so add them up
+                for key, value in (getattr(chunk, 'usage_metadata', None) or {}).items():
+                    if key in usage:
+                        usage[key] += value or 0
+                text = chunk.content if isinstance(chunk.content, str) else "".join(
+                    part.get('text', '') if isinstance(part, dict) else str(part) for part in chunk.content)
+                if text:
+                    yield text
+        finally:
+            # Recorded for cancelled streams too (e.g. a speculative reply that wasn't needed); a stream
+            # cut off before its first usage report is charged the prompt's estimated size
+            record_llm_call(time.perf_counter() - started, usage['input_tokens'] or approx_tokens(prompt),
+                            usage['output_tokens'], operation="free_text")
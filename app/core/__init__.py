@@ -0,0 +1,31 @@
+from .core import (
+    Task,
+    CalendarEvent,
+    AgentState,
+    tasks_file,
+    calendar_file,
+    load_tasks,
+    load_task_records,
+    save_tasks,
+    load_calendar,
+    save_calendar,
+    task_journal,
+    calendar_journal,
+    initialize_vertexai,
+)
+from .persistence import Journal
+from .task_store import TaskStore
+from .task_archive import TaskArchive
+from .calendar_index import CalendarIndex
+from .scheduler import ScheduledTask, schedule_day, schedule_batch
+from .intent_classifier import FastIntent, FastIntentClassifier, normalize_input
+from .llm_cache import IntentCache
+from .llm_dispatcher import LLMDispatcher, TokenBucket, is_retryable
+from .user_registry import UserSession, UserRegistry, DEFAULT_USER_ID
+from .lazy import Lazy
+from .sync import make_cursor, delta_since, apply_mutations, serve_sync
+from .text_index import TaskMatch, MatchResult, TaskTextIndex
+from .suggestion_cache import SuggestionCache
+from .prompt_engine import PromptEngine, RenderedPrompt, approx_tokens
+from .instrumentation import (logger, configure_logging, metrics, Metrics, timed_node, record_llm_call,
+                              write_prometheus_textfile, PeriodicTextfileExporter, serve_stats, enable_opentelemetry)
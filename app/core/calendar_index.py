@@ -0,0 +1,152 @@
+from bisect import bisect_left, bisect_right
+from datetime import date, datetime, time
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from .core import CalendarEvent, event_record
+from .persistence import Journal
+
+# Assumed working hours when computing the free windows of a day
+WORKDAY_START = time(9, 0)
+WORKDAY_END = time(17, 0)
+
+
+class CalendarIndex:
+    """
+    Calendar events merged into disjoint, sorted busy blocks.
+
+    Overlapping, nested and back-to-back events collapse into a single block, kept
+    as parallel sorted lists of starts/ends so the block covering a time and the
+    next block after it are found with one bisect. Blocks are merged incrementally
+    as events are added; removing or replacing an event (same id) rebuilds them. If
+    a journal is attached, changes are appended to it. `version` counts changes, and
+    listeners are called after each one.
+    """
+
+    def __init__(self, events: Iterable[CalendarEvent] = (), journal: Optional[Journal] = None):
+        self.events: List[CalendarEvent] = []
+        self._by_id: Dict[str, CalendarEvent] = {}
+        self._starts: List[datetime] = []
+        self._ends: List[datetime] = []
+        # Summary of the earliest event in each block, used for "until 'X' starts" messages
+        self._summaries: List[str] = []
+        self.version = 0
+        self._listeners: List[Callable[[], None]] = []
+        for event in events:
+            self._put(event)
+        self.journal = journal
+        if journal is not None:
+            journal.snapshot_source = lambda: [event_record(event) for event in self.events]
+            journal.owner = self
+
+    def __len__(self) -> int:
+        return len(self.events)
+
+    def __iter__(self):
+        return iter(self.events)
+
+    def __contains__(self, event_id: str) -> bool:
+        return event_id in self._by_id
+
+    def get(self, event_id: str) -> Optional[CalendarEvent]:
+        return self._by_id.get(event_id)
+
+    def _put(self, event: CalendarEvent):
+        if event.id in self._by_id:
+            self._drop(event.id)
+        self.events.append(event)
+        self._by_id[event.id] = event
+        start, end = event.start_time, event.end_time
+        if end <= start:
+            return
+        # Blocks i..j-1 touch [start, end] (ends are sorted too, since blocks are disjoint)
+        i = bisect_left(self._ends, start)
+        j = bisect_right(self._starts, end)
+        summary = event.summary
+        if i < j:
+            if self._starts[i] <= start:
+                summary = self._summaries[i]
+            start = min(start, self._starts[i])
+            end = max(end, self._ends[j - 1])
+        self._starts[i:j] = [start]
+        self._ends[i:j] = [end]
+        self._summaries[i:j] = [summary]
+
+    def _drop(self, event_id: str):
+        # Merged blocks don't record which events formed them, so they're rebuilt without the event
+        del self._by_id[event_id]
+        events = [event for event in self.events if event.id != event_id]
+        self.events, self._starts, self._ends, self._summaries = [], [], [], []
+        self._by_id.clear()
+        for event in events:
+            self._put(event)
+
+    def _log(self, op: dict):
+        if self.journal is not None:
+            self.journal.append(op)
+        self.version += 1
+        for listener in self._listeners:
+            listener()
+
+    def add(self, event: CalendarEvent) -> CalendarEvent:
+        """Adds an event, merging it into the busy blocks (replacing any event with the same id)."""
+        self._put(event)
+        self._log({"op": "add", "event": event_record(event)})
+        return event
+
+    def remove(self, event_id: str) -> Optional[CalendarEvent]:
+        """Removes an event. Returns it, or None if missing."""
+        event = self._by_id.get(event_id)
+        if event is None:
+            return None
+        self._drop(event_id)
+        self._log({"op": "delete", "id": event_id})
+        return event
+
+    def add_listener(self, listener: Callable[[], None]):
+        """Calls `listener` after every change (under whatever lock the caller holds)."""
+        self._listeners.append(listener)
+
+    def busy_blocks(self) -> List[Tuple[datetime, datetime, str]]:
+        return list(zip(self._starts, self._ends, self._summaries))
+
+    def block_at(self, t: datetime) -> Optional[Tuple[datetime, datetime, str]]:
+        """The busy block covering t, if any."""
+        i = bisect_right(self._starts, t) - 1
+        if i >= 0 and t < self._ends[i]:
+            return self._starts[i], self._ends[i], self._summaries[i]
+        return None
+
+    def next_block(self, t: datetime) -> Optional[Tuple[datetime, datetime, str]]:
+        """The first busy block starting at or after t."""
+        i = bisect_left(self._starts, t)
+        if i < len(self._starts):
+            return self._starts[i], self._ends[i], self._summaries[i]
+        return None
+
+    def free_window_at(self, t: datetime) -> Tuple[datetime, Optional[Tuple[datetime, datetime, str]]]:
+        """
+        Returns (free_from, next_block): when the user is next free at or after t,
+        and the busy block that ends that free window (None if nothing is scheduled after).
+        """
+        current = self.block_at(t)
+        free_from = current[1] if current else t
+        return free_from, self.next_block(free_from)
+
+    def free_windows(self, day: date, start: Optional[datetime] = None,
+                     workday_start: time = WORKDAY_START, workday_end: time = WORKDAY_END) -> List[Tuple[datetime, datetime]]:
+        """All free (start, end) windows within the working hours of `day`, optionally from `start` on."""
+        window_start = datetime.combine(day, workday_start)
+        window_end = datetime.combine(day, workday_end)
+        if start is not None and start > window_start:
+            window_start = start
+        windows = []
+        cursor = window_start
+        i = bisect_right(self._ends, window_start)
+        while i < len(self._starts) and self._starts[i] < window_end:
+            if self._starts[i] > cursor:
+                windows.append((cursor, self._starts[i]))
+            cursor = max(cursor, self._ends[i])
+            i += 1
+        if cursor < window_end:
+            windows.append((cursor, window_end))
+        return windows
@@ -5,13 +5,14 @@ import uuid
 import json
 import os
 from pathlib import Path
-import google.oauth2.service_account
-import vertexai
-from vertexai.generative_models import GenerativeModel
+
+from .instrumentation import logger
+from .persistence import Journal
 
 # File paths for persistent storage
-tasks_file = Path("app/database/tasks.json")
-calendar_file = Path("app/database/calendar.json")
+database_dir = Path("app/database")
+tasks_file = database_dir / "tasks.json"
+calendar_file = database_dir / "calendar.json"
 
 class Task(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
@@ -20,79 +21,161 @@ class Task(BaseModel):
     estimated_time_minutes: int = Field(description="Estimated time in minutes")
     added_at: datetime = Field(default_factory=datetime.now)
     completed: bool = False
+    notes: Optional[str] = None
 
 class CalendarEvent(BaseModel):
+    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
     start_time: datetime
     end_time: datetime
     summary: str
 
 class AgentState(TypedDict):
+    user_id: Optional[str]
     user_input: Optional[str]
     task_id_to_complete: Optional[str]
     intent: str
     extracted_task_info: Optional[dict]
     suggestion: Optional[Task]
     next_event_info: Optional[dict]
+    schedule: Optional[list]
     response: str
     error: Optional[str]
 
-# Initialize the database files if they don't exist
-if not tasks_file.exists():
-    tasks_file.parent.mkdir(parents=True, exist_ok=True)
-    with open(tasks_file, "w") as f:
-        json.dump([], f)
-if not calendar_file.exists():
-    calendar_file.parent.mkdir(parents=True, exist_ok=True)
-    with open(calendar_file, "w") as f:
-        json.dump([], f)
-
-def load_tasks():
-    if tasks_file.exists():
-        with open(tasks_file, "r") as f:
-            return [Task(**task) for task in json.load(f)]
-    return []
-
-def save_tasks(tasks):
-    with open(tasks_file, "w") as f:
-        json.dump([task.dict() for task in tasks], f, indent=4)
-
-def load_calendar():
-    if calendar_file.exists():
-        with open(calendar_file, "r") as f:
-            return [CalendarEvent(**event) for event in json.load(f)]
-    return []
-
-def save_calendar(events):
-    with open(calendar_file, "w") as f:
-        json.dump([event.dict() for event in events], f, indent=4)
+# Mutations are appended to a write-ahead log and compacted into snapshots;
+# the legacy JSON files above are migrated into a snapshot on first load.
+task_journal = Journal(database_dir, "tasks", legacy_file=tasks_file)
+calendar_journal = Journal(database_dir, "calendar", legacy_file=calendar_file)
+
+def _task_from_record(record: dict) -> Task:
+    # Records in the snapshot/log were written from validated Tasks, so skip re-validation
+    return Task.model_construct(**{**record, "added_at": datetime.fromisoformat(record["added_at"])})
+
+def _event_id(record: dict) -> str:
+    # Events logged before they had ids are keyed by their content, so replaying one twice still yields one event
+    return record.get("id") or str(uuid.uuid5(uuid.NAMESPACE_OID, f"{record['start_time']}|{record['end_time']}|{record['summary']}"))
+
+def _event_from_record(record: dict) -> CalendarEvent:
+    return CalendarEvent.model_construct(id=_event_id(record),
+                                         start_time=datetime.fromisoformat(record["start_time"]),
+                                         end_time=datetime.fromisoformat(record["end_time"]),
+                                         summary=record["summary"])
+
+def task_record(task: Task) -> dict:
+    return task.model_dump(mode="json")
+
+def event_record(event: CalendarEvent) -> dict:
+    return event.model_dump(mode="json")
+
+def apply_task_op(records: dict, op: dict):
+    """Applies one logged task mutation to a dict of task records keyed by id."""
+    if op["op"] == "add":
+        records[op["task"]["id"]] = dict(op["task"])
+    elif op["op"] == "complete":
+        if op["id"] in records:
+            records[op["id"]]["completed"] = True
+    elif op["op"] == "edit":
+        if op["id"] in records:
+            records[op["id"]].update(op["fields"])
+    elif op["op"] == "delete":
+        records.pop(op["id"], None)
+
+def apply_event_op(records: dict, op: dict):
+    """Applies one logged calendar mutation to a dict of event records keyed by id."""
+    if op["op"] == "add":
+        records[_event_id(op["event"])] = op["event"]
+    elif op["op"] == "delete":
+        records.pop(op["id"], None)
+
+def load_task_records(journal: Journal = task_journal) -> List[dict]:
+    """Replays the journal into plain task records (the TaskStore loads these without building Task objects)."""
+    records, ops = journal.replay(migrate=lambda legacy: [task_record(Task(**r)) for r in legacy])
+    by_id = {record["id"]: record for record in records}
+    for op in ops:
+        apply_task_op(by_id, op)
+    return list(by_id.values())
+
+def load_tasks(journal: Journal = task_journal):
+    return [_task_from_record(record) for record in load_task_records(journal)]
+
+def save_tasks(tasks, journal: Journal = task_journal):
+    """
+    Saves `tasks` as the whole task list. While a session has the list loaded (the journal's
+    owner), only the differences go through its TaskStore, so its indexes, sync history and
+    listeners stay current; call it under that session's lock. Otherwise a full snapshot is
+    written and the log truncated (a checkpoint).
+    """
+    tasks = list(tasks)
+    store = journal.owner
+    if store is None:
+        journal.compact([task_record(task) for task in tasks], background=False)
+        return
+    current = {record["id"]: record for record in store.records()}
+    for task in tasks:
+        if current.pop(task.id, None) != task_record(task):
+            store.add(task)
+    for task_id in current:
+        store.delete(task_id)
+
+def load_calendar(journal: Journal = calendar_journal):
+    records, ops = journal.replay(migrate=lambda legacy: [event_record(CalendarEvent(**r)) for r in legacy])
+    by_id = {_event_id(record): record for record in records}
+    for op in ops:
+        apply_event_op(by_id, op)
+    return [_event_from_record(record) for record in by_id.values()]
+
+def save_calendar(events, journal: Journal = calendar_journal):
+    """
+    Saves `events` as the whole calendar. While a session has the calendar loaded (the
+    journal's owner), only the differences go through its CalendarIndex, so new events are
+    merged into the busy blocks incrementally and listeners see the change; call it under
+    that session's lock. Otherwise a full snapshot is written and the log truncated (a checkpoint).
+    """
+    events = list(events)
+    index = journal.owner
+    if index is None:
+        journal.compact([event_record(event) for event in events], background=False)
+        return
+    current = {event.id: event_record(event) for event in index}
+    for event in events:
+        if current.pop(event.id, None) != event_record(event):
+            index.add(event)
+    for event_id in current:
+        index.remove(event_id)
 
 def initialize_vertexai(model_name: str = "gemini-1.5-pro"):
+    """
+    Returns a LangChain chat model for Gemini on Vertex AI (None if it can't be configured).
+    The agent needs its with_structured_output/batch surface for intent parsing and astream
+    for streamed free-text replies; the raw vertexai GenerativeModel has neither.
+    """
+    # Imported here rather than at module level: the Gemini SDK dominates cold start
+    import google.oauth2.service_account
+    from langchain_google_genai import ChatGoogleGenerativeAI
+
     GCP_PROJECT_ID = os.getenv("GCP_PROJECT_ID")
     GCP_SA_KEY_PATH = ".env/GCP_SA_KEY.json"
 
     #LLM initialization
     try:
         # Create credentials object directly from the dictionary info
-        credentials = google.oauth2.service_account.Credentials.from_service_account_file(GCP_SA_KEY_PATH)
-        print("Credentials retrieved.")
+        credentials = google.oauth2.service_account.Credentials.from_service_account_file(
+            GCP_SA_KEY_PATH, scopes=["https://www.googleapis.com/auth/cloud-platform"])
+        logger.info("Credentials retrieved.")
 
-        # Initialize Vertex AI using the credentials object 
-        vertexai.init(project=GCP_PROJECT_ID, location='us-central1', credentials=credentials) # ADDED credentials=...
-        print("Vertex AI Initialized Successfully.")
-        
-        # Specify a model - we're using gemini 1.5 pro for initial development
-        llm = GenerativeModel(model_name=model_name, temperature=0.2, max_output_tokens=512) 
-        print(f"{model_name} Model Loaded.")
+        # Vertex AI backend, authenticated with the service account
+        llm = ChatGoogleGenerativeAI(model=model_name, vertexai=True, project=GCP_PROJECT_ID, location='us-central1',
+                                     credentials=credentials, temperature=0.2, max_output_tokens=512)
+        logger.info("%s Model Loaded.", model_name)
 
         return llm
 
     except Exception as e:
-        print(f"Error during initialization: {e}")
-        print("Please ensure 'GCP_PROJECT_ID' and 'GCP_SA_KEY_JSON' secrets are correctly set and the Service Account has 'Vertex AI User' role.")
+        logger.error("Error during initialization: %s", e)
+        logger.error("Please ensure 'GCP_PROJECT_ID' and 'GCP_SA_KEY_JSON' secrets are correctly set and the Service Account has 'Vertex AI User' role.")
         # Check if the error is related to parsing the JSON itself
         if isinstance(e, json.JSONDecodeError):
-            print("Error: Could not parse the GCP_SA_KEY_JSON content. Ensure it's valid JSON.")
+            logger.error("Could not parse the GCP_SA_KEY_JSON content. Ensure it's valid JSON.")
         # Check if error is related to creating credentials from info
         elif "Could not parse service account file" in str(e):
-            print("Error: The structure of the JSON key seems incorrect for creating credentials.")
+            logger.error("The structure of the JSON key seems incorrect for creating credentials.")
 
@@ -0,0 +1,320 @@
+import functools
+import inspect
+import json
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+# Structured, leveled logging
+
+logger = logging.getLogger("focusflow")
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line, including any `extra=` fields passed to the logger."""
+
+    _STANDARD = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime"}
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        entry.update({key: value for key, value in vars(record).items() if key not in self._STANDARD})
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+def configure_logging(level: Optional[str] = None, json_format: bool = True):
+    """
+    Sets up the focusflow logger. Level comes from FOCUSFLOW_LOG_LEVEL (default WARNING);
+    below the level, log calls return before formatting anything.
+    """
+    level = (level or os.getenv("FOCUSFLOW_LOG_LEVEL", "WARNING")).upper()
+    logger.setLevel(level)
+    if not logger.handlers:
+        handler = logging.StreamHandler()
+        handler.setFormatter(JsonFormatter() if json_format else logging.Formatter("%(levelname)s %(name)s: %(message)s"))
+        logger.addHandler(handler)
+        logger.propagate = False
+
+
+# Metrics
+
+# Latency buckets in seconds, from sub-millisecond index lookups to multi-second LLM calls
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+TOKEN_BUCKETS = (64, 128, 256, 512, 1024, 2048, 4096, 8192)
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+class Histogram:
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q: float) -> float:
+        """Upper bound of the bucket holding the q-th observation."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets + (float("inf"),), self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return float("inf")
+
+
+class Metrics:
+    """
+    In-process metrics registry: counters, histograms and pull-based collectors
+    (e.g. cache/index stats). Listeners receive every observation, which is how
+    push exporters such as OpenTelemetry hook in. Set FOCUSFLOW_METRICS=0 (or
+    `enabled = False`) to make every call a no-op.
+    """
+
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self.counters: Dict[str, Dict[LabelKey, float]] = {}
+        self.histograms: Dict[str, Dict[LabelKey, Histogram]] = {}
+        self._buckets: Dict[str, tuple] = {}
+        self._collectors: Dict[str, Callable[[], dict]] = {}
+        self._listeners: List[Callable[[str, str, float, dict], None]] = []
+
+    @staticmethod
+    def _key(labels: dict) -> LabelKey:
+        return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+    def inc(self, name: str, value: float = 1, **labels):
+        if not self.enabled:
+            return
+        key = self._key(labels)
+        with self._lock:
+            series = self.counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + value
+        for listener in self._listeners:
+            listener("counter", name, value, labels)
+
+    def observe(self, name: str, value: float, buckets=None, **labels):
+        if not self.enabled:
+            return
+        key = self._key(labels)
+        with self._lock:
+            if buckets is not None:
+                self._buckets.setdefault(name, tuple(buckets))
+            series = self.histograms.setdefault(name, {})
+            histogram = series.get(key)
+            if histogram is None:
+                histogram = series[key] = Histogram(self._buckets.get(name, LATENCY_BUCKETS))
+            histogram.observe(value)
+        for listener in self._listeners:
+            listener("histogram", name, value, labels)
+
+    def register_collector(self, name: str, collect: Callable[[], dict]):
+        """`collect` returns a flat dict of numeric stats, exported as gauges named <name>_<key>."""
+        self._collectors[name] = collect
+
+    def add_listener(self, listener: Callable[[str, str, float, dict], None]):
+        self._listeners.append(listener)
+
+    def snapshot(self) -> dict:
+        """JSON-ready view of every metric (the in-process stats endpoint)."""
+        with self._lock:
+            counters = {name: [{"labels": dict(key), "value": value} for key, value in series.items()]
+                        for name, series in self.counters.items()}
+            histograms = {name: [{"labels": dict(key), "count": h.count, "sum": h.sum,
+                                  "p50": h.quantile(0.5), "p95": h.quantile(0.95), "p99": h.quantile(0.99)}
+                                 for key, h in series.items()]
+                          for name, series in self.histograms.items()}
+        gauges = {}
+        for name, collect in self._collectors.items():
+            gauges[name] = {key: value for key, value in collect().items() if isinstance(value, (int, float))}
+        return {"counters": counters, "histograms": histograms, "gauges": gauges}
+
+    def prometheus_text(self) -> str:
+        """Metrics in the Prometheus text exposition format."""
+        def labels_text(key: LabelKey, extra: Tuple[Tuple[str, str], ...] = ()) -> str:
+            pairs = key + extra
+            return "{" + ",".join(f'{k}="{v}"' for k, v in pairs) + "}" if pairs else ""
+
+        lines = []
+        with self._lock:
+            for name, series in self.counters.items():
+                lines.append(f"# TYPE {name} counter")
+                lines.extend(f"{name}{labels_text(key)} {value}" for key, value in series.items())
+            for name, series in self.histograms.items():
+                lines.append(f"# TYPE {name} histogram")
+                for key, h in series.items():
+                    cumulative = 0
+                    for bound, count in zip(h.buckets + (float("inf"),), h.counts):
+                        cumulative += count
+                        le = "+Inf" if bound == float("inf") else repr(bound)
+                        lines.append(f"{name}_bucket{labels_text(key, (('le', le),))} {cumulative}")
+                    lines.append(f"{name}_sum{labels_text(key)} {h.sum}")
+                    lines.append(f"{name}_count{labels_text(key)} {h.count}")
+        for name, collect in self._collectors.items():
+            for key, value in collect().items():
+                if isinstance(value, (int, float)):
+                    lines.append(f"# TYPE {name}_{key} gauge")
+                    lines.append(f"{name}_{key} {value}")
+        return "\n".join(lines) + "\n"
+
+    def reset(self):
+        with self._lock:
+            self.counters.clear()
+            self.histograms.clear()
+
+
+metrics = Metrics(enabled=os.getenv("FOCUSFLOW_METRICS", "1") != "0")
+
+
+def timed_node(name: str):
+    """Records the node's latency in focusflow_node_latency_seconds{node=name}."""
+    def decorator(node):
+        @functools.wraps(node)
+        def wrapper(*args, **kwargs):
+            if not metrics.enabled:
+                return node(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return node(*args, **kwargs)
+            finally:
+                metrics.observe("focusflow_node_latency_seconds", time.perf_counter() - start, node=name)
+
+        @functools.wraps(node)
+        async def async_wrapper(*args, **kwargs):
+            if not metrics.enabled:
+                return await node(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return await node(*args, **kwargs)
+            finally:
+                metrics.observe("focusflow_node_latency_seconds", time.perf_counter() - start, node=name)
+
+        return async_wrapper if inspect.iscoroutinefunction(node) else wrapper
+    return decorator
+
+
+def record_llm_call(duration_s: float, input_tokens: Optional[int] = None, output_tokens: Optional[int] = None,
+                    operation: str = "parse_intent", model_tier: str = "default", cached_tokens: Optional[int] = None):
+    labels = {"operation": operation, "model_tier": model_tier}
+    metrics.observe("focusflow_llm_call_seconds", duration_s, **labels)
+    metrics.inc("focusflow_llm_calls_total", **labels)
+    if input_tokens is not None:
+        metrics.observe("focusflow_llm_input_tokens", input_tokens, buckets=TOKEN_BUCKETS, **labels)
+        metrics.inc("focusflow_llm_input_tokens_total", input_tokens, **labels)
+    if output_tokens is not None:
+        metrics.observe("focusflow_llm_output_tokens", output_tokens, buckets=TOKEN_BUCKETS, **labels)
+        metrics.inc("focusflow_llm_output_tokens_total", output_tokens, **labels)
+    if cached_tokens:
+        metrics.inc("focusflow_llm_cached_input_tokens_total", cached_tokens, **labels)
+    logger.info("LLM call %s (%s): %.0f ms, %s input tokens (%s cached), %s output tokens", operation, model_tier,
+                duration_s * 1000, input_tokens, cached_tokens or 0, output_tokens)
+
+
+# Exporters
+
+def write_prometheus_textfile(path: Path, registry: Metrics = metrics):
+    """Writes metrics atomically for node_exporter's textfile collector."""
+    path = Path(path)
+    tmp_path = path.with_suffix(path.suffix + ".tmp")
+    tmp_path.write_text(registry.prometheus_text())
+    os.replace(tmp_path, path)
+
+
+class PeriodicTextfileExporter:
+    """Rewrites the Prometheus text file every `interval` seconds from a daemon thread."""
+
+    def __init__(self, path: Path, interval: float = 15.0, registry: Metrics = metrics):
+        self.path = Path(path)
+        self.interval = interval
+        self.registry = registry
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="metrics-textfile", daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            write_prometheus_textfile(self.path, self.registry)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        write_prometheus_textfile(self.path, self.registry)
+
+
+def serve_stats(port: int = 9464, host: str = "127.0.0.1", registry: Metrics = metrics) -> ThreadingHTTPServer:
+    """Serves /metrics (Prometheus text) and /stats (JSON) from a daemon thread."""
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path == "/metrics":
+                body, content_type = registry.prometheus_text().encode(), "text/plain; version=0.0.4"
+            elif self.path == "/stats":
+                body, content_type = json.dumps(registry.snapshot()).encode(), "application/json"
+            else:
+                self.send_error(404)
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            logger.debug("stats endpoint: " + format, *args)
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    return server
+
+
+def enable_opentelemetry(endpoint: str = "http://localhost:4317", registry: Metrics = metrics):
+    """
+    Forwards every observation to OpenTelemetry instruments exported over OTLP to a
+    local collector. Needs opentelemetry-sdk and opentelemetry-exporter-otlp.
+    """
+    try:
+        from opentelemetry import metrics as otel_metrics
+        from opentelemetry.exporter.otlp.proto.grpc.metric_exporter import OTLPMetricExporter
+        from opentelemetry.sdk.metrics import MeterProvider
+        from opentelemetry.sdk.metrics.export import PeriodicExportingMetricReader
+    except ImportError as e:
+        raise ImportError("enable_opentelemetry requires opentelemetry-sdk and opentelemetry-exporter-otlp") from e
+
+    reader = PeriodicExportingMetricReader(OTLPMetricExporter(endpoint=endpoint, insecure=True))
+    provider = MeterProvider(metric_readers=[reader])
+    otel_metrics.set_meter_provider(provider)
+    meter = provider.get_meter("focusflow")
+    instruments = {}
+
+    def forward(kind: str, name: str, value: float, labels: dict):
+        instrument = instruments.get(name)
+        if instrument is None:
+            instrument = instruments[name] = (meter.create_counter(name) if kind == "counter"
+                                              else meter.create_histogram(name))
+        if kind == "counter":
+            instrument.add(value, labels)
+        else:
+            instrument.record(value, labels)
+
+    registry.add_listener(forward)
+    return provider
@@ -0,0 +1,117 @@
+import re
+from collections import Counter
+from typing import Callable, Optional, Tuple
+
+from pydantic import BaseModel
+
+# Each simple intent is recognized by anchored patterns over the normalized input,
+# so a match is unambiguous and can skip the LLM entirely.
+_INTENT_PATTERNS = {
+    'greet': [
+        r"(hi|hello|hey|hiya|howdy|yo|greetings)( there)?( focusflow)?",
+        r"good (morning|afternoon|evening)( focusflow)?",
+    ],
+    'goodbye': [
+        r"(bye|goodbye|bye bye|cya|see ya|see you( later| soon| tomorrow)?|good ?night|later)",
+        r"(thanks|thank you|thx),? (bye|goodbye|see you( later)?)",
+        r"(i'?m|i am) done for (today|the day|now)",
+    ],
+    'list_tasks': [
+        r"(list|show|view|display|see)( me)?( all)?( of)?( my)?( the)?( (active|current|open|remaining))? (tasks?|to-?dos?|list)",
+        r"what('s| is| are) (on )?my (tasks?|to-?dos?|list|task list|to-?do list)",
+        r"(my )?tasks",
+    ],
+    'suggest_task': [
+        r"(suggest|recommend)( me)?( (a|one|another|the next|my next))?( (task|thing|something))?( to (do|work on))?( (now|next))?",
+        r"what should i (do|work on|tackle|focus on)( (now|next|right now))?",
+        r"(give me|pick)( a| another)? task",
+        r"what('s| is) next",
+    ],
+    'plan_day': [
+        r"plan (my |the )?(day|today)",
+        r"(plan|schedule) (my tasks for today|the rest of (my|the) day)",
+    ],
+}
+
+_COMPLETE_PATTERN = re.compile(
+    r"(?:complete|completed|finish|finished|done with|mark|check off|i finished|i completed|i'?ve finished|i'?ve completed)"
+    r"(?: the)?(?: task)?:? (?P<description>.+?)(?: as (?:complete|completed|done|finished))?"
+)
+
+_COMPILED = {intent: [re.compile(pattern) for pattern in patterns] for intent, patterns in _INTENT_PATTERNS.items()}
+
+_TRAILING_PUNCTUATION = re.compile(r"[\s.!?,;:]+$")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_input(text: str) -> str:
+    """Lowercases, collapses whitespace and strips trailing punctuation."""
+    text = _WHITESPACE.sub(" ", text.strip().lower())
+    text = text.replace("please ", "").replace(" please", "")
+    return _TRAILING_PUNCTUATION.sub("", text)
+
+
+class FastIntent(BaseModel):
+    """An intent resolved locally, without an LLM call."""
+    intent: str
+    confidence: float
+    source: str
+    task_id_to_complete: Optional[str] = None
+
+
+class FastIntentClassifier:
+    """
+    Local pre-classifier run before the LLM in parse_user_input.
+
+    Compiled rule patterns resolve greet/goodbye/list_tasks/suggest_task/plan_day, and
+    complete_task when the text names exactly one active task. An optional local model
+    (callable: normalized text -> (intent, confidence)) is consulted when no rule matches.
+    Anything below `threshold` confidence is a miss and falls back to the LLM.
+    """
+
+    def __init__(self, model: Optional[Callable[[str], Tuple[str, float]]] = None, threshold: float = 0.9):
+        self.model = model
+        self.threshold = threshold
+        self.hits = 0
+        self.misses = 0
+        self.hits_by_intent = Counter()
+
+    def _match_rules(self, text: str, task_store=None) -> Optional[FastIntent]:
+        for intent, patterns in _COMPILED.items():
+            if any(pattern.fullmatch(text) for pattern in patterns):
+                return FastIntent(intent=intent, confidence=1.0, source="rule")
+        match = _COMPLETE_PATTERN.fullmatch(text)
+        if match and task_store is not None:
+            candidates = task_store.find_active_by_description(match.group("description"))
+            # Only an exact, unambiguous match is safe to resolve without the LLM
+            if len(candidates) == 1:
+                return FastIntent(intent="complete_task", confidence=1.0, source="rule",
+                                  task_id_to_complete=candidates[0].id)
+        return None
+
+    def classify(self, user_input: Optional[str], task_store=None) -> Optional[FastIntent]:
+        """Returns the resolved intent, or None if the LLM should handle the input."""
+        result = None
+        if user_input:
+            text = normalize_input(user_input)
+            result = self._match_rules(text, task_store)
+            if result is None and self.model is not None:
+                intent, confidence = self.model(text)
+                # The model can't resolve which task to complete, so leave those to the LLM
+                if intent in _COMPILED and confidence >= self.threshold:
+                    result = FastIntent(intent=intent, confidence=confidence, source="model")
+        if result is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+            self.hits_by_intent[result.intent] += 1
+        return result
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "llm_calls_avoided_ratio": self.hits / total if total else 0.0,
+            "hits_by_intent": dict(self.hits_by_intent),
+        }
@@ -0,0 +1,47 @@
+import asyncio
+import threading
+from typing import Callable, Generic, Optional, TypeVar
+
+T = TypeVar("T")
+
+
+class Lazy(Generic[T]):
+    """
+    Builds a value on first use and reuses it afterwards (thread-safe).
+    Used to keep heavy SDK imports and client creation off the import path.
+    """
+
+    def __init__(self, factory: Callable[[], T]):
+        self.factory = factory
+        self._value: Optional[T] = None
+        self._initialized = False
+        self._lock = threading.Lock()
+
+    @property
+    def initialized(self) -> bool:
+        return self._initialized
+
+    def get(self) -> T:
+        if not self._initialized:
+            with self._lock:
+                if not self._initialized:
+                    self._value = self.factory()
+                    self._initialized = True
+        return self._value
+
+    async def aget(self) -> T:
+        """get() for coroutines: the first build runs on a worker thread, off the event loop."""
+        if self._initialized:
+            return self._value
+        return await asyncio.to_thread(self.get)
+
+    def set(self, value: T):
+        """Replaces the value (e.g. with a stub client in benchmarks)."""
+        with self._lock:
+            self._value = value
+            self._initialized = True
+
+    def reset(self):
+        with self._lock:
+            self._value = None
+            self._initialized = False
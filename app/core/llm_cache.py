@@ -0,0 +1,100 @@
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from datetime import date
+from pathlib import Path
+from typing import Optional, Type
+
+from pydantic import BaseModel
+
+from .intent_classifier import normalize_input
+
+
+class IntentCache:
+    """
+    Caches validated structured-output results of the intent-parsing LLM call.
+
+    Keys combine the normalized user input with the date-sensitive part of the
+    prompt (today's date), so "add buy milk" and "Add buy milk." share an entry
+    but nothing relative like "tomorrow" leaks across days. The in-memory tier is
+    an LRU bounded by `max_entries`; entries expire after `ttl_seconds`. If `path`
+    is given, entries are also written to a SQLite file so they survive restarts.
+    """
+
+    def __init__(self, model: Type[BaseModel], max_entries: int = 1024, ttl_seconds: float = 6 * 3600,
+                 path: Optional[Path] = None):
+        self.model = model
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._db = None
+        if path is not None:
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+            self._db = sqlite3.connect(str(path), check_same_thread=False)
+            self._db.execute("CREATE TABLE IF NOT EXISTS intent_cache (key TEXT PRIMARY KEY, value TEXT, expires_at REAL)")
+            self._db.execute("DELETE FROM intent_cache WHERE expires_at <= ?", (time.time(),))
+            self._db.commit()
+
+    @staticmethod
+    def make_key(user_input: str, today: date) -> str:
+        return f"{today.isoformat()}|{normalize_input(user_input)}"
+
+    def get(self, key: str) -> Optional[BaseModel]:
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, expires_at = entry
+                if expires_at > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+            if self._db is not None:
+                row = self._db.execute("SELECT value, expires_at FROM intent_cache WHERE key = ? AND expires_at > ?",
+                                       (key, now)).fetchone()
+                if row is not None:
+                    value = self.model.model_validate_json(row[0])
+                    self._remember(key, value, row[1])
+                    self.hits += 1
+                    return value
+            self.misses += 1
+            return None
+
+    def _remember(self, key: str, value: BaseModel, expires_at: float):
+        self._entries[key] = (value, expires_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def put(self, key: str, value: BaseModel):
+        expires_at = time.time() + self.ttl_seconds
+        with self._lock:
+            self._remember(key, value, expires_at)
+            if self._db is not None:
+                self._db.execute("INSERT OR REPLACE INTO intent_cache (key, value, expires_at) VALUES (?, ?, ?)",
+                                 (key, value.model_dump_json(), expires_at))
+                self._db.commit()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM intent_cache")
+                self._db.commit()
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "evictions": self.evictions,
+            "size": len(self._entries),
+        }
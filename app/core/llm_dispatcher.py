@@ -0,0 +1,309 @@
+import asyncio
+import contextlib
+import queue
+import random
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+from .instrumentation import logger, metrics
+
+# HTTP statuses / API error names that mean "try again later" rather than "this request is bad"
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+RETRYABLE_ERRORS = {"ResourceExhausted", "TooManyRequests", "ServiceUnavailable", "DeadlineExceeded",
+                    "InternalServerError"}
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64)
+# How often a call made outside the queue checks for a free request slot
+SLOT_POLL_S = 0.01
+
+
+def is_retryable(exc: Exception) -> bool:
+    status = getattr(exc, "status_code", None) or getattr(exc, "code", None)
+    return status in RETRYABLE_STATUS or type(exc).__name__ in RETRYABLE_ERRORS
+
+
+class TokenBucket:
+    """
+    Rate limiter: `rate` tokens per second, bursting up to `capacity`. Callers reserve
+    tokens up front (the balance may go negative) and sleep off the debt, so waiting
+    callers are served in arrival order. `pause` stops refills for everyone, e.g.
+    after the API answers 429.
+    """
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity or max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def reserve(self, tokens: float = 1) -> float:
+        """Takes `tokens` and returns how many seconds the caller must wait before using them."""
+        with self._lock:
+            now = time.monotonic()
+            if now > self._paused_until:
+                self._tokens = min(self.capacity, self._tokens + (now - max(self._updated, self._paused_until)) * self.rate)
+                self._updated = now
+            self._tokens -= tokens
+            wait = max(0.0, self._paused_until - now)
+            if self._tokens < 0:
+                wait += -self._tokens / self.rate
+            return wait
+
+    def acquire(self, tokens: float = 1) -> float:
+        wait = self.reserve(tokens)
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    def pause(self, seconds: float):
+        with self._lock:
+            now = time.monotonic()
+            if now > self._paused_until:
+                # Bank the tokens earned so far; nothing accrues while paused
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+            self._paused_until = max(self._paused_until, now + seconds)
+
+
+class _Request:
+    __slots__ = ("prompt", "future", "enqueued_at", "attempts")
+
+    def __init__(self, prompt: str, future: Future):
+        self.prompt = prompt
+        self.future = future
+        self.enqueued_at = time.perf_counter()
+        self.attempts = 0
+
+
+class LLMDispatcher:
+    """
+    Funnels every structured-output LLM call through one shared client.
+
+    Requests queue up and a dispatcher thread drains them in micro-batches: under load
+    it waits up to `batch_window_ms` after the first request for others to arrive, then sends
+    the batch with the client's `batch()` (concurrent calls over the client's shared
+    connection pool). Identical prompts already queued or in flight are coalesced into
+    one call. A token bucket caps the request rate, at most `max_concurrency` requests
+    are in flight, and retryable failures (429/5xx) are re-queued with exponential
+    backoff and jitter, pausing the bucket so other callers back off too.
+
+    `client_source` is called per batch, so swapping the underlying client (e.g. for a
+    stub) takes effect without rebuilding the dispatcher.
+    """
+
+    def __init__(self, client_source: Callable[[], Any], max_concurrency: int = 8, rate_per_second: float = 10.0,
+                 burst: Optional[float] = None, batch_window_ms: float = 5.0, max_batch_size: int = 16,
+                 max_retries: int = 4, backoff_base: float = 0.25, backoff_max: float = 8.0):
+        self.client_source = client_source
+        self.max_concurrency = max_concurrency
+        self.batch_window = batch_window_ms / 1000.0
+        # A batch never needs more permits than exist, so the dispatcher thread can't wait on itself
+        self.max_batch_size = max(1, min(max_batch_size, max_concurrency))
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.bucket = TokenBucket(rate_per_second, burst)
+        self._queue: "queue.Queue[Optional[_Request]]" = queue.Queue()
+        self._slots = threading.Semaphore(max_concurrency)
+        self._pending: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._closed = False
+        self.in_flight = 0
+        self.requests = 0
+        self.batches = 0
+        self.coalesced = 0
+        self.retries = 0
+        self.failures = 0
+        self.throttled_seconds = 0.0
+
+    def _start(self):
+        # Started on first use so importing the agent doesn't spawn threads
+        self._executor = ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix="llm-call")
+        self._thread = threading.Thread(target=self._run, name="llm-dispatcher", daemon=True)
+        self._thread.start()
+
+    def submit(self, prompt: str) -> Future:
+        """Queues a call and returns a Future for the client's output."""
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("LLMDispatcher is closed")
+            future = self._pending.get(prompt)
+            if future is not None:
+                self.coalesced += 1
+                return future
+            future = self._pending[prompt] = Future()
+            self.requests += 1
+            if self._thread is None:
+                self._start()
+        future.add_done_callback(lambda _: self._forget(prompt, future))
+        self._queue.put(_Request(prompt, future))
+        return future
+
+    def _forget(self, prompt: str, future: Future):
+        with self._lock:
+            if self._pending.get(prompt) is future:
+                del self._pending[prompt]
+
+    def invoke(self, prompt: str, timeout: Optional[float] = None):
+        return self.submit(prompt).result(timeout)
+
+    async def ainvoke(self, prompt: str):
+        return await asyncio.wrap_future(self.submit(prompt))
+
+    @contextlib.asynccontextmanager
+    async def aslot(self):
+        """
+        Holds one request slot, after paying the rate limit, for a call made outside the
+        queue (e.g. a streamed reply), so it counts against the same limits as queued calls.
+        """
+        if self._closed:
+            raise RuntimeError("LLMDispatcher is closed")
+        # Polled rather than awaited on a thread, so a cancelled caller can't leak a slot
+        while not self._slots.acquire(blocking=False):
+            await asyncio.sleep(SLOT_POLL_S)
+        try:
+            wait = self.bucket.reserve()
+            with self._lock:
+                self.requests += 1
+                self.throttled_seconds += wait
+            if wait > 0:
+                await asyncio.sleep(wait)
+            with self._lock:
+                self.in_flight += 1
+            try:
+                yield
+            finally:
+                with self._lock:
+                    self.in_flight -= 1
+        finally:
+            self._slots.release()
+
+    # Dispatcher thread
+
+    def _next_batch(self) -> Optional[List[_Request]]:
+        first = self._queue.get()
+        if first is None:
+            return None
+        batch = [first]
+        if not self.in_flight and self._queue.empty():
+            # Idle: nothing to coalesce with, so don't make a lone request wait out the window
+            return batch
+        deadline = time.monotonic() + self.batch_window
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                request = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if request is None:
+                # Send what we have, then stop
+                self._queue.put(None)
+                break
+            batch.append(request)
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                return
+            for _ in batch:
+                self._slots.acquire()
+            self.throttled_seconds += self.bucket.acquire(len(batch))
+            with self._lock:
+                self.in_flight += len(batch)
+                self.batches += 1
+            now = time.perf_counter()
+            metrics.observe("focusflow_llm_batch_size", len(batch), buckets=BATCH_SIZE_BUCKETS)
+            for request in batch:
+                metrics.observe("focusflow_llm_queue_wait_seconds", now - request.enqueued_at)
+            self._executor.submit(self._call, batch)
+
+    def _call(self, batch: List[_Request]):
+        prompts = [request.prompt for request in batch]
+        try:
+            client = self.client_source()
+            if client is None:
+                raise RuntimeError("LLM not configured")
+            if len(batch) > 1 and hasattr(client, "batch"):
+                results = client.batch(prompts, return_exceptions=True)
+            else:
+                results = [self._invoke_one(client, prompt) for prompt in prompts]
+        except Exception as e:
+            results = [e] * len(batch)
+        finally:
+            with self._lock:
+                self.in_flight -= len(batch)
+            for _ in batch:
+                self._slots.release()
+
+        retry = []
+        for request, result in zip(batch, results):
+            if not isinstance(result, Exception):
+                request.future.set_result(result)
+            elif is_retryable(result) and request.attempts < self.max_retries:
+                request.attempts += 1
+                retry.append((request, result))
+            else:
+                with self._lock:
+                    self.failures += 1
+                request.future.set_exception(result)
+        if retry:
+            self._schedule_retry(retry)
+
+    @staticmethod
+    def _invoke_one(client, prompt: str):
+        try:
+            return client.invoke(prompt)
+        except Exception as e:
+            return e
+
+    def _schedule_retry(self, retry: list):
+        attempts = max(request.attempts for request, _ in retry)
+        delay = min(self.backoff_max, self.backoff_base * 2 ** (attempts - 1)) * random.uniform(0.5, 1.0)
+        # Honour the server's hint if it sent one
+        delay = max([delay] + [getattr(error, "retry_after", None) or 0 for _, error in retry])
+        self.bucket.pause(delay)
+        with self._lock:
+            self.retries += len(retry)
+        logger.warning("LLM call failed with %s; retrying %d request(s) in %.2fs",
+                       type(retry[0][1]).__name__, len(retry), delay)
+
+        def requeue():
+            for request, error in retry:
+                if self._closed:
+                    request.future.set_exception(error)
+                else:
+                    self._queue.put(request)
+        timer = threading.Timer(delay, requeue)
+        timer.daemon = True
+        timer.start()
+
+    def stats(self) -> dict:
+        return {
+            "queue_depth": self._queue.qsize(),
+            "in_flight": self.in_flight,
+            "requests": self.requests,
+            "batches": self.batches,
+            "coalesced": self.coalesced,
+            "retries": self.retries,
+            "failures": self.failures,
+            "throttled_seconds": round(self.throttled_seconds, 3),
+        }
+
+    def close(self):
+        """Stops taking requests; queued ones are still sent."""
+        with self._lock:
+            self._closed = True
+            started = self._thread is not None
+        if started:
+            self._queue.put(None)
+            self._thread.join()
+            self._executor.shutdown(wait=True)
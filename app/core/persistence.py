@@ -0,0 +1,218 @@
+import atexit
+import json
+import os
+import threading
+import time
+import weakref
+from pathlib import Path
+from typing import Callable, List, Optional, Tuple
+
+from .instrumentation import logger
+
+# One background thread syncs every open journal, so per-user journals don't each need a thread
+FLUSH_TICK = 0.25
+_open_journals = weakref.WeakSet()
+_flusher_lock = threading.Lock()
+_flusher: Optional[threading.Thread] = None
+
+
+def _flush_periodically():
+    while True:
+        time.sleep(FLUSH_TICK)
+        for journal in list(_open_journals):
+            journal._sync_if_due()
+
+
+def _register(journal: "Journal"):
+    global _flusher
+    with _flusher_lock:
+        _open_journals.add(journal)
+        if _flusher is None:
+            _flusher = threading.Thread(target=_flush_periodically, name="journal-sync", daemon=True)
+            _flusher.start()
+            atexit.register(close_all)
+
+
+def close_all():
+    """Syncs and closes every open journal (registered to run at exit)."""
+    for journal in list(_open_journals):
+        journal.close()
+
+
+class Journal:
+    """
+    Append-only write-ahead log plus a compacted snapshot for one collection.
+
+    Every mutation is appended to `<name>.log` as one JSON line. fsync is batched:
+    the log is synced after `sync_every` appends or `sync_interval` seconds,
+    whichever comes first. After `compact_every` appends the log is rotated and
+    a snapshot of the current state is written in a background thread, so
+    startup only has to replay the snapshot plus the short log tail.
+
+    Ops must be idempotent (set-by-key semantics): after a crash mid-compaction
+    the rotated log is replayed on top of a snapshot that may already contain it.
+    """
+
+    def __init__(self, directory: Path, name: str, legacy_file: Optional[Path] = None,
+                 sync_every: int = 32, sync_interval: float = 1.0, compact_every: int = 5000):
+        self.directory = Path(directory)
+        self.name = name
+        self.legacy_file = legacy_file
+        self.snapshot_file = self.directory / f"{name}.snapshot.json"
+        self.log_file = self.directory / f"{name}.log"
+        self.rotated_log_file = self.directory / f"{name}.log.1"
+        self.sync_every = sync_every
+        self.sync_interval = sync_interval
+        self.compact_every = compact_every
+        # Callable returning the full current state as JSON-ready records; set by the owner of the data
+        self.snapshot_source: Optional[Callable[[], List[dict]]] = None
+        # The loaded store that writes this journal, if any (save_tasks/save_calendar go through it)
+        self.owner = None
+
+        self._lock = threading.RLock()
+        self._log = None
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+        self._appended_since_compact = 0
+        self._compaction: Optional[threading.Thread] = None
+
+    # Startup
+
+    def replay(self, migrate: Optional[Callable[[List[dict]], List[dict]]] = None) -> Tuple[List[dict], List[dict]]:
+        """
+        Returns (snapshot_records, ops) to rebuild state from.
+        If neither a snapshot nor a log exists yet, the legacy JSON file (if any)
+        is migrated into a snapshot once, passing its records through `migrate`.
+        """
+        with self._lock:
+            self._wait_for_compaction()
+            if not self.snapshot_file.exists() and not self.log_file.exists() and not self.rotated_log_file.exists():
+                records = []
+                if self.legacy_file and self.legacy_file.exists():
+                    with open(self.legacy_file, "r") as f:
+                        records = json.load(f)
+                    if migrate:
+                        records = migrate(records)
+                    self._write_snapshot(records)
+                    logger.info("Migrated %d records from %s to %s", len(records), self.legacy_file, self.snapshot_file)
+                return records, []
+
+            records = []
+            if self.snapshot_file.exists():
+                with open(self.snapshot_file, "r") as f:
+                    records = json.load(f)
+            ops = self._read_log(self.rotated_log_file) + self._read_log(self.log_file)
+            return records, ops
+
+    @staticmethod
+    def _read_log(path: Path) -> List[dict]:
+        ops = []
+        if not path.exists():
+            return ops
+        with open(path, "r") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    ops.append(json.loads(line))
+                except json.JSONDecodeError:
+                    # A torn final line from a crash mid-append; everything before it is intact
+                    logger.warning("Ignoring truncated record at the end of %s", path)
+                    break
+        return ops
+
+    # Writes
+
+    def _open_log(self):
+        if self._log is None:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            self._log = open(self.log_file, "a")
+            _register(self)
+        return self._log
+
+    def append(self, op: dict):
+        """Appends one mutation to the log. Durable after the next batched fsync (or sync())."""
+        with self._lock:
+            log = self._open_log()
+            log.write(json.dumps(op, separators=(",", ":")) + "\n")
+            log.flush()
+            self._unsynced += 1
+            self._appended_since_compact += 1
+            if self._unsynced >= self.sync_every or time.monotonic() - self._last_sync >= self.sync_interval:
+                self._sync_locked()
+            if self.compact_every and self._appended_since_compact >= self.compact_every and self.snapshot_source:
+                self.compact(self.snapshot_source(), background=True)
+
+    def _sync_locked(self):
+        if self._log is not None and self._unsynced:
+            os.fsync(self._log.fileno())
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+
+    def sync(self):
+        """Forces pending appends to disk."""
+        with self._lock:
+            self._sync_locked()
+
+    def _sync_if_due(self):
+        with self._lock:
+            if self._unsynced and time.monotonic() - self._last_sync >= self.sync_interval:
+                self._sync_locked()
+
+    # Compaction
+
+    def _write_snapshot(self, records: List[dict]):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        tmp_file = self.snapshot_file.with_suffix(".json.tmp")
+        with open(tmp_file, "w") as f:
+            json.dump(records, f, separators=(",", ":"))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_file, self.snapshot_file)
+
+    def _finish_compaction(self, records: List[dict]):
+        self._write_snapshot(records)
+        # The snapshot now covers everything in the rotated log
+        self.rotated_log_file.unlink(missing_ok=True)
+
+    def _wait_for_compaction(self):
+        if self._compaction is not None:
+            self._compaction.join()
+            self._compaction = None
+
+    def compact(self, records: List[dict], background: bool = True):
+        """
+        Rotates the log and writes `records` (the full current state) as the new snapshot.
+        `records` must reflect every op appended so far.
+        """
+        with self._lock:
+            self._wait_for_compaction()
+            if self._log is not None:
+                self._sync_locked()
+                self._log.close()
+                self._log = None
+            if self.rotated_log_file.exists():
+                # Left by a compaction that crashed before its snapshot landed, so its ops are
+                # only on disk there; cover them with a snapshot before the rotation replaces it
+                self._finish_compaction(records)
+            if self.log_file.exists():
+                os.replace(self.log_file, self.rotated_log_file)
+            self._appended_since_compact = 0
+            if background:
+                self._compaction = threading.Thread(target=self._finish_compaction, args=(records,),
+                                                    name=f"{self.name}-journal-compact", daemon=True)
+                self._compaction.start()
+            else:
+                self._finish_compaction(records)
+
+    def close(self):
+        with self._lock:
+            _open_journals.discard(self)
+            self.owner = None
+            self.snapshot_source = None
+            self._wait_for_compaction()
+            if self._log is not None:
+                self._sync_locked()
+                self._log.close()
+                self._log = None
@@ -0,0 +1,96 @@
+import re
+import threading
+from datetime import datetime
+from typing import Dict, NamedTuple, Optional
+
+from .instrumentation import metrics
+
+# Rough characters per token for English prompts; good enough for budgets and stats
+CHARS_PER_TOKEN = 4
+
+# Joiners that suggest more than one clause, where the full example set earns its cost
+_COMPOUND = re.compile(r"[,;:]|\b(?:and|then|but|because|unless|after|before|while)\b", re.IGNORECASE)
+
+
+def approx_tokens(text: str) -> int:
+    return -(-len(text) // CHARS_PER_TOKEN)
+
+
+class RenderedPrompt(NamedTuple):
+    tier: str
+    # (("system", prefix), ("human", suffix)), the chat-model message form; hashable so
+    # identical pending calls can be coalesced
+    messages: tuple
+
+
+class PromptEngine:
+    """
+    A prompt split into a static prefix per tier (shared instructions plus that tier's
+    examples), compiled once, and a short `suffix` template rendered per call with the
+    request and the current date and time. Calls send the prefix as a byte-identical system
+    message ahead of the suffix. That alone gets no cache discount: the prefixes (~520 and
+    ~680 tokens) are below Gemini's minimum for implicit caching and the 1.5 models don't
+    cache implicitly, and no explicit context cache is created, so
+    focusflow_llm_cached_input_tokens_total stays 0. The savings come from the lite tier.
+
+    Requests that look simple (a few words, one clause) use the "lite" tier: fewer
+    examples and, where the caller configures one, a cheaper model. Requests longer than
+    `max_request_tokens` are trimmed so one pasted wall of text can't blow the budget.
+    """
+
+    def __init__(self, instructions: str, examples: Dict[str, str], suffix: str,
+                 simple_max_words: int = 8, max_request_tokens: int = 256):
+        if "full" not in examples:
+            raise ValueError("examples must include a 'full' tier")
+        self._prefixes = {tier: f"{instructions.strip()}\n\n{tier_examples.strip()}\n"
+                          for tier, tier_examples in examples.items()}
+        self._prefix_tokens = {tier: approx_tokens(prefix) for tier, prefix in self._prefixes.items()}
+        self.suffix = suffix
+        self.simple_max_words = simple_max_words
+        self.max_request_tokens = max_request_tokens
+        self._lock = threading.Lock()
+        self._rendered = {tier: 0 for tier in self._prefixes}
+        self._suffix_tokens = 0
+        self._trimmed = 0
+
+    @property
+    def tiers(self):
+        return tuple(self._prefixes)
+
+    def prefix(self, tier: str) -> str:
+        return self._prefixes[tier]
+
+    def is_simple(self, request: str) -> bool:
+        # Bounding characters as well as words keeps one long pasted token out of the lite tier
+        return (len(request) <= self.simple_max_words * 12 and len(request.split()) <= self.simple_max_words
+                and not _COMPOUND.search(request))
+
+    def tier_for(self, request: str) -> str:
+        return "lite" if "lite" in self._prefixes and self.is_simple(request) else "full"
+
+    def _trim(self, request: str) -> str:
+        limit = self.max_request_tokens * CHARS_PER_TOKEN
+        if len(request) <= limit:
+            return request
+        with self._lock:
+            self._trimmed += 1
+        metrics.inc("focusflow_prompt_trimmed_total")
+        return request[:limit].rstrip() + "..."
+
+    def render(self, request: str, now: Optional[datetime] = None) -> RenderedPrompt:
+        now = now or datetime.now()
+        tier = self.tier_for(request)
+        text = self.suffix.format(request=self._trim(request), date=now.strftime('%Y-%m-%d'),
+                                  time=now.strftime('%H:%M'))
+        with self._lock:
+            self._rendered[tier] += 1
+            self._suffix_tokens += approx_tokens(text)
+        return RenderedPrompt(tier, (("system", self._prefixes[tier]), ("human", text)))
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = {f"rendered_{tier}": count for tier, count in self._rendered.items()}
+            stats["suffix_tokens"] = self._suffix_tokens
+            stats["trimmed"] = self._trimmed
+        stats.update({f"prefix_tokens_{tier}": tokens for tier, tokens in self._prefix_tokens.items()})
+        return stats
@@ -0,0 +1,87 @@
+from datetime import datetime, timedelta
+from typing import Iterable, List, Sequence, Tuple
+
+from pydantic import BaseModel
+
+from .core import Task
+
+try:
+    import numpy as np
+except ImportError:  # Only needed for the batch planner
+    np = None
+
+
+class ScheduledTask(BaseModel):
+    task_id: str
+    description: str
+    priority: int
+    estimated_time_minutes: int
+    start_time: datetime
+    end_time: datetime
+
+
+def _window_minutes(window: Tuple[datetime, datetime]) -> int:
+    return int((window[1] - window[0]).total_seconds() / 60)
+
+
+def schedule_day(tasks: Iterable[Task], windows: Sequence[Tuple[datetime, datetime]]) -> List[ScheduledTask]:
+    """
+    Packs tasks into free windows in one pass (greedy first-fit by priority).
+
+    `tasks` must already be in (priority, estimated_time_minutes) order, e.g.
+    TaskStore.active_by_priority(). Each task goes into the earliest window that
+    still has room for it, so high-priority tasks are placed first and small tasks
+    fill the gaps left behind. Returns the schedule ordered by start time.
+    """
+    remaining = [_window_minutes(window) for window in windows]
+    cursors = [window[0] for window in windows]
+    schedule = []
+    for task in tasks:
+        for i, free in enumerate(remaining):
+            if task.estimated_time_minutes <= free:
+                start = cursors[i]
+                end = start + timedelta(minutes=task.estimated_time_minutes)
+                schedule.append(ScheduledTask(task_id=task.id, description=task.description,
+                                              priority=task.priority,
+                                              estimated_time_minutes=task.estimated_time_minutes,
+                                              start_time=start, end_time=end))
+                remaining[i] -= task.estimated_time_minutes
+                cursors[i] = end
+                break
+        if not any(free > 0 for free in remaining):
+            break
+    schedule.sort(key=lambda item: item.start_time)
+    return schedule
+
+
+def schedule_batch(priorities, durations, capacities):
+    """
+    Vectorized version of schedule_day over many users at once (nightly precomputation).
+
+    priorities, durations: (users, max_tasks) int arrays; pad unused slots with priority 0.
+    capacities: (users, max_windows) free minutes per window in chronological order; pad with 0.
+    Returns a (users, max_tasks) array with the window index each task was assigned to,
+    or -1 if it did not fit. Assignments match schedule_day for each user.
+    """
+    if np is None:
+        raise ImportError("schedule_batch requires numpy")
+    priorities = np.asarray(priorities)
+    durations = np.asarray(durations)
+    remaining = np.array(capacities, dtype=np.int64, copy=True)
+    users, max_tasks = priorities.shape
+    valid = priorities > 0
+    # Same order as the TaskStore index: (priority, estimate), padding last
+    order = np.lexsort((durations, np.where(valid, priorities, np.iinfo(priorities.dtype).max)), axis=-1)
+    rows = np.arange(users)
+    assignment = np.full((users, max_tasks), -1, dtype=np.int64)
+    if remaining.shape[1] == 0:
+        return assignment
+    for rank in range(max_tasks):
+        columns = order[:, rank]
+        needed = durations[rows, columns]
+        fits = remaining >= needed[:, None]
+        window = fits.argmax(axis=1)
+        placed = fits[rows, window] & valid[rows, columns]
+        remaining[rows[placed], window[placed]] -= needed[placed]
+        assignment[rows[placed], columns[placed]] = window[placed]
+    return assignment
@@ -0,0 +1,98 @@
+import heapq
+import threading
+import weakref
+from datetime import datetime
+from itertools import count
+from typing import Any, Callable, List, Optional, Tuple
+
+from .calendar_index import CalendarIndex
+from .instrumentation import metrics
+from .task_store import TaskStore
+
+# One thread refreshes every cache whose window boundary has passed
+_boundaries: List[tuple] = []
+_boundaries_changed = threading.Condition()
+_boundary_seq = count()
+_refresher: Optional[threading.Thread] = None
+
+
+def _refresh_at_boundaries():
+    while True:
+        with _boundaries_changed:
+            while not _boundaries or _boundaries[0][0] > datetime.now():
+                timeout = (_boundaries[0][0] - datetime.now()).total_seconds() if _boundaries else None
+                _boundaries_changed.wait(timeout)
+            _, _, cache_ref, valid_until = heapq.heappop(_boundaries)
+        cache = cache_ref()
+        if cache is not None and cache._scheduled == valid_until:
+            cache._scheduled = None
+        # Skip caches that were dropped, invalidated or already refreshed since this was scheduled
+        if cache is not None and cache._entry is not None and cache._entry[3] == valid_until:
+            with cache.lock:
+                if cache._entry is not None and cache._entry[3] == valid_until:
+                    cache._refresh(datetime.now())
+
+
+def _schedule_boundary(cache: "SuggestionCache", valid_until: datetime):
+    global _refresher
+    with _boundaries_changed:
+        heapq.heappush(_boundaries, (valid_until, next(_boundary_seq), weakref.ref(cache), valid_until))
+        if _refresher is None:
+            _refresher = threading.Thread(target=_refresh_at_boundaries, name="suggestion-refresh", daemon=True)
+            _refresher.start()
+        _boundaries_changed.notify()
+
+
+class SuggestionCache:
+    """
+    One precomputed suggestion for a user's session.
+
+    `compute(now)` returns the suggestion and the time it stays valid until (e.g. the
+    end of the current free window, or the moment the suggested task stops fitting in
+    what is left of it). An entry is served while the task store and calendar are at
+    the versions it was computed from and the clock is inside its validity window, so
+    a lookup is a few comparisons. Change events from the store and calendar drop the
+    entry; a shared timer recomputes it when its window boundary passes, so the next
+    lookup is usually a hit even after the window moves on.
+
+    `lock` must be the lock that guards the store and calendar (the session lock).
+    """
+
+    def __init__(self, compute: Callable[[datetime], Tuple[Any, datetime]], tasks: TaskStore,
+                 calendar: CalendarIndex, lock):
+        self.compute = compute
+        self.tasks = tasks
+        self.calendar = calendar
+        self.lock = lock
+        # (task version, calendar version, computed_at, valid_until, value)
+        self._entry: Optional[tuple] = None
+        # Boundary already queued with the refresher, so repeated refreshes in one window queue it once
+        self._scheduled: Optional[datetime] = None
+        self.hits = 0
+        self.misses = 0
+        tasks.add_listener(self.invalidate)
+        calendar.add_listener(self.invalidate)
+
+    def invalidate(self):
+        self._entry = None
+
+    def _refresh(self, now: datetime) -> tuple:
+        value, valid_until = self.compute(now)
+        self._entry = (self.tasks.version, self.calendar.version, now, valid_until, value)
+        if valid_until > now and valid_until != self._scheduled:
+            self._scheduled = valid_until
+            _schedule_boundary(self, valid_until)
+        return self._entry
+
+    def get(self, now: datetime) -> Tuple[Any, datetime]:
+        """The suggestion valid at `now` and the time it was computed. Call with `lock` held."""
+        entry = self._entry
+        if (entry is not None and entry[0] == self.tasks.version and entry[1] == self.calendar.version
+                and entry[2] <= now < entry[3]):
+            self.hits += 1
+            metrics.inc("focusflow_suggestion_cache_total", result="hit")
+        else:
+            self.misses += 1
+            metrics.inc("focusflow_suggestion_cache_total", result="miss")
+            entry = self._refresh(now)
+        return entry[4], entry[2]
@@ -0,0 +1,235 @@
+import gzip
+import json
+import re
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+from pydantic import ValidationError
+
+from .core import Task, task_record
+from .instrumentation import logger, metrics
+from .task_store import TaskStore
+from .user_registry import UserRegistry
+
+# Fields a client may change through an edit mutation
+EDITABLE_FIELDS = {"description", "priority", "estimated_time_minutes", "notes", "completed"}
+# Responses larger than this are gzipped for clients that accept it
+GZIP_MIN_BYTES = 1024
+
+_TASKS_PATH = re.compile(r"^/api/users/(?P<user_id>[^/]+)/tasks(?P<sync>/sync)?$")
+
+
+# Cursors
+
+def make_cursor(store: TaskStore) -> str:
+    return f"{store.epoch}.{store.version}"
+
+
+def parse_cursor(cursor: Optional[str]) -> Optional[Tuple[str, int]]:
+    if not cursor or not isinstance(cursor, str):
+        return None
+    epoch, _, version = cursor.partition(".")
+    return (epoch, int(version)) if version.isdigit() else None
+
+
+def etag(store: TaskStore) -> str:
+    return f'"{make_cursor(store)}"'
+
+
+# Deltas and mutations
+
+def delta_since(store: TaskStore, cursor: Optional[str]) -> dict:
+    """
+    What a client holding `cursor` needs to catch up: the current state of every task
+    changed since then plus the ids deleted since then. Clients with no cursor, a cursor
+    from another epoch (e.g. before a restart) or one older than the retained history get
+    every task with "reset": true and should replace their copy.
+    """
+    parsed = parse_cursor(cursor)
+    changed = store.changes_since(parsed[1]) if parsed and parsed[0] == store.epoch else None
+    if changed is None:
+        return {"cursor": make_cursor(store), "reset": True, "tasks": store.records(), "deleted": []}
+    tasks, deleted = [], []
+    for task_id in changed:
+        task = store.get(task_id)
+        if task is None:
+            deleted.append(task_id)
+        else:
+            tasks.append(task_record(task))
+    return {"cursor": make_cursor(store), "reset": False, "tasks": tasks, "deleted": deleted}
+
+
+def apply_mutation(store: TaskStore, mutation: dict) -> dict:
+    """
+    Applies one client mutation. Mutations are idempotent, so a client can safely resend a
+    batch whose response it never saw: adds carry the client's task id (re-adding replaces),
+    completing a completed task and deleting a missing one succeed without changes.
+    """
+    if not isinstance(mutation, dict):
+        return {"ok": False, "id": None, "error": "mutation must be a JSON object"}
+    op, task_id = mutation.get("op"), mutation.get("id")
+    try:
+        if op == "add":
+            task = store.add(Task(**mutation["task"]))
+            return {"ok": True, "id": task.id}
+        if op == "complete":
+            existing = store.get(task_id)
+            if existing is None:
+                return {"ok": False, "id": task_id, "error": "not found"}
+            if not existing.completed:
+                store.complete(task_id)
+            return {"ok": True, "id": task_id}
+        if op == "edit":
+            fields = mutation.get("fields") or {}
+            unknown = set(fields) - EDITABLE_FIELDS
+            if unknown:
+                return {"ok": False, "id": task_id, "error": f"fields not editable: {sorted(unknown)}"}
+            if store.edit(task_id, **fields) is None:
+                return {"ok": False, "id": task_id, "error": "not found"}
+            return {"ok": True, "id": task_id}
+        if op == "delete":
+            store.delete(task_id)
+            return {"ok": True, "id": task_id}
+        return {"ok": False, "id": task_id, "error": f"unknown op: {op!r}"}
+    except (ValidationError, KeyError, TypeError) as e:
+        return {"ok": False, "id": task_id, "error": str(e)}
+
+
+def apply_mutations(store: TaskStore, mutations: List[dict]) -> List[dict]:
+    """Applies a batch in order; each mutation succeeds or fails on its own."""
+    results = [apply_mutation(store, mutation) for mutation in mutations]
+    metrics.inc("focusflow_sync_mutations_total", len(mutations))
+    return results
+
+
+# HTTP endpoint
+
+def serve_sync(registry: UserRegistry, port: int = 8000, host: str = "127.0.0.1", *,
+               allowed_origin: str) -> ThreadingHTTPServer:
+    """
+    Serves the task sync API for the React UI from a daemon thread:
+
+        GET  /api/users/<user_id>/tasks?since=<cursor>    -> delta (304 if If-None-Match is current)
+        POST /api/users/<user_id>/tasks/sync               {"since": cursor, "mutations": [...]}
+                                                           -> {"results": [...], ...delta since `since`}
+
+    Each request holds the user's session lock, so it is serialized with agent turns.
+
+    There is no authentication: the user id in the path is trusted as-is, so anything that
+    can reach the port can read and change every user's tasks. Keep it on localhost (or
+    behind an authenticating proxy). Browser requests are only served for `allowed_origin`,
+    the UI's exact origin (e.g. "http://localhost:5173"); requests carrying any other Origin
+    get 403, so other pages the user visits can't use the endpoint.
+    """
+    if not allowed_origin or allowed_origin == "*":
+        raise ValueError("serve_sync needs the UI's exact origin, not a wildcard")
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def _origin_allowed(self) -> bool:
+            # Requests without an Origin don't come from a web page's script
+            origin = self.headers.get("Origin")
+            if origin is None or origin == allowed_origin:
+                return True
+            metrics.inc("focusflow_sync_requests_total", kind="forbidden_origin")
+            self._send(403, {"error": "origin not allowed"})
+            return False
+
+        def _route(self) -> Optional[Tuple[str, bool, dict]]:
+            url = urlsplit(self.path)
+            match = _TASKS_PATH.match(url.path)
+            if match is None:
+                return None
+            return match["user_id"], bool(match["sync"]), parse_qs(url.query)
+
+        def _send(self, status: int, payload: Optional[dict] = None, headers: Optional[dict] = None):
+            body = json.dumps(payload, separators=(",", ":")).encode() if payload is not None else b""
+            self.send_response(status)
+            self.send_header("Access-Control-Allow-Origin", allowed_origin)
+            self.send_header("Access-Control-Expose-Headers", "ETag")
+            if payload is not None:
+                self.send_header("Content-Type", "application/json")
+                if len(body) >= GZIP_MIN_BYTES and "gzip" in self.headers.get("Accept-Encoding", ""):
+                    body = gzip.compress(body)
+                    self.send_header("Content-Encoding", "gzip")
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_OPTIONS(self):
+            if not self._origin_allowed():
+                return
+            self.send_response(204)
+            self.send_header("Access-Control-Allow-Origin", allowed_origin)
+            self.send_header("Access-Control-Allow-Methods", "GET, POST, OPTIONS")
+            self.send_header("Access-Control-Allow-Headers", "Content-Type, If-None-Match")
+            self.send_header("Access-Control-Max-Age", "86400")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+
+        def do_GET(self):
+            if not self._origin_allowed():
+                return
+            route = self._route()
+            if route is None or route[1]:
+                self._send(404, {"error": "not found"})
+                return
+            user_id, _, query = route
+            try:
+                with registry.locked(user_id) as session:
+                    current = etag(session.tasks)
+                    if self.headers.get("If-None-Match") == current:
+                        metrics.inc("focusflow_sync_requests_total", kind="not_modified")
+                        self._send(304, headers={"ETag": current})
+                        return
+                    delta = delta_since(session.tasks, query.get("since", [None])[0])
+            except ValueError as e:
+                self._send(400, {"error": str(e)})
+                return
+            metrics.inc("focusflow_sync_requests_total", kind="reset" if delta["reset"] else "delta")
+            self._send(200, delta, {"ETag": f'"{delta["cursor"]}"', "Cache-Control": "no-cache"})
+
+        def do_POST(self):
+            # Read the body first so a rejected request doesn't leave it in a kept-alive connection
+            length = self.headers.get("Content-Length") or "0"
+            if not length.isdigit():
+                self.close_connection = True
+                self._send(400, {"error": "invalid Content-Length"})
+                return
+            body = self.rfile.read(int(length))
+            if not self._origin_allowed():
+                return
+            route = self._route()
+            if route is None or not route[1]:
+                self._send(404, {"error": "not found"})
+                return
+            try:
+                body = json.loads(body or b"{}")
+                if not isinstance(body, dict):
+                    raise ValueError("body must be a JSON object")
+                mutations = body.get("mutations", [])
+                if not isinstance(mutations, list):
+                    raise ValueError("mutations must be a list")
+                if not isinstance(body.get("since"), (str, type(None))):
+                    raise ValueError("since must be a cursor string")
+                with registry.locked(route[0]) as session:
+                    results = apply_mutations(session.tasks, mutations)
+                    delta = delta_since(session.tasks, body.get("since"))
+            except ValueError as e:
+                self._send(400, {"error": str(e)})
+                return
+            metrics.inc("focusflow_sync_requests_total", kind="mutations")
+            self._send(200, {"results": results, **delta}, {"ETag": f'"{delta["cursor"]}"'})
+
+        def log_message(self, format, *args):
+            logger.debug("sync endpoint: " + format, *args)
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="sync-http", daemon=True).start()
+    return server
@@ -0,0 +1,63 @@
+import json
+import zlib
+from typing import Dict, Iterator, List, Optional
+
+# Completed tasks per compressed block
+BLOCK_SIZE = 512
+
+
+class TaskArchive:
+    """
+    Cold storage for completed tasks.
+
+    Each task is a compact row [id, description, priority, estimate, added_micros, seq].
+    Rows are appended to a tail list; every BLOCK_SIZE rows the tail is packed into a
+    zlib-compressed JSON block. Only an id -> position map stays uncompressed, so lookups
+    of a single completed task decode one block and full scans (snapshots) decode each
+    block once. Rows that are replaced or removed stay in their block as garbage and
+    are skipped.
+    """
+
+    def __init__(self):
+        self._blocks: List[bytes] = []
+        self._tail: List[list] = []
+        self._positions: Dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self._positions)
+
+    def __contains__(self, task_id: str) -> bool:
+        return task_id in self._positions
+
+    def add(self, row: list):
+        self._positions[row[0]] = len(self._blocks) * BLOCK_SIZE + len(self._tail)
+        self._tail.append(row)
+        if len(self._tail) == BLOCK_SIZE:
+            self._blocks.append(zlib.compress(json.dumps(self._tail, separators=(",", ":")).encode()))
+            self._tail = []
+
+    def _block(self, index: int) -> List[list]:
+        if index == len(self._blocks):
+            return self._tail
+        return json.loads(zlib.decompress(self._blocks[index]))
+
+    def get(self, task_id: str) -> Optional[list]:
+        position = self._positions.get(task_id)
+        if position is None:
+            return None
+        block, offset = divmod(position, BLOCK_SIZE)
+        return self._block(block)[offset]
+
+    def pop(self, task_id: str) -> Optional[list]:
+        row = self.get(task_id)
+        if row is not None:
+            del self._positions[task_id]
+        return row
+
+    def __iter__(self) -> Iterator[list]:
+        """Live rows in archive order."""
+        for index in range(len(self._blocks) + 1):
+            base = index * BLOCK_SIZE
+            for offset, row in enumerate(self._block(index)):
+                if self._positions.get(row[0]) == base + offset:
+                    yield row
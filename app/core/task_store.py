@@ -0,0 +1,395 @@
+import heapq
+import sys
+import uuid
+from array import array
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timedelta
+from itertools import count
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from .core import Task
+from .persistence import Journal
+from .task_archive import TaskArchive
+from .text_index import MatchResult, TaskTextIndex
+
+# Priorities are validated to 1..5 on the Task model
+PRIORITIES = range(1, 6)
+
+_EPOCH = datetime(1970, 1, 1)
+_MICROSECOND = timedelta(microseconds=1)
+# Tombstoned rows are compacted away once there are this many and they outnumber live rows
+_COMPACT_MIN_DEAD = 1024
+# Changed task ids kept for incremental sync; clients further behind get a full resync
+CHANGE_HISTORY = 10000
+
+
+def _to_micros(value) -> int:
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    if value.tzinfo is not None:
+        value = value.astimezone().replace(tzinfo=None)
+    return (value - _EPOCH) // _MICROSECOND
+
+
+def _from_micros(micros: int) -> datetime:
+    return _EPOCH + timedelta(microseconds=micros)
+
+
+class _SortedPairs:
+    """(key, row) pairs kept sorted by key then row, in two parallel int arrays."""
+
+    __slots__ = ("keys", "rows")
+
+    def __init__(self):
+        self.keys = array("q")
+        self.rows = array("q")
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def _position(self, key: int, row: int) -> int:
+        lo = bisect_left(self.keys, key)
+        return bisect_left(self.rows, row, lo, bisect_right(self.keys, key, lo))
+
+    def insert(self, key: int, row: int):
+        i = self._position(key, row)
+        self.keys.insert(i, key)
+        self.rows.insert(i, row)
+
+    def remove(self, key: int, row: int):
+        i = self._position(key, row)
+        if i < len(self.keys) and self.keys[i] == key and self.rows[i] == row:
+            del self.keys[i]
+            del self.rows[i]
+
+    def remap(self, new_rows: array):
+        # Compaction preserves row order, so renumbering keeps the pairs sorted
+        self.rows = array("q", [new_rows[row] for row in self.rows])
+
+
+class TaskStore:
+    """
+    Columnar task store. Active tasks live in parallel arrays (priority, estimate,
+    added_at as epoch microseconds, insertion sequence), one row per task in insertion
+    order, with interned id and description strings. Completed tasks move to a
+    compressed TaskArchive, so the hot columns and every index only cover active work.
+
+    Per priority, two sorted (key, row) indexes give (priority, estimated_time_minutes)
+    order for best-fit suggestions and (priority, added_at) order for listing; both are
+    updated incrementally. Eligibility ("fits in N minutes") is a bisect into the
+    estimate index and a slice of the rows before it, with no per-task checks.
+
+    Task objects are only built at the API boundary (get/active_tasks/...).
+    If a journal is attached, every add/complete/edit/delete is appended to it.
+
+    Every mutation bumps `version` and is remembered in a bounded change history,
+    so sync clients can ask what changed since the version they last saw. `epoch`
+    identifies this in-memory history; versions from another epoch are meaningless.
+    Listeners are called after every mutation.
+    """
+
+    def __init__(self, tasks: Iterable[Task] = (), journal: Optional[Journal] = None):
+        # Hot columns; a completed row is tombstoned (_live = 0) until the next compaction
+        self._ids: List[str] = []
+        self._descriptions: List[str] = []
+        self._priority = array("b")
+        self._estimate = array("q")
+        self._added = array("q")
+        self._seq = array("q")
+        self._live = bytearray()
+        self._row: Dict[str, int] = {}
+        self._dead = 0
+        self._counter = count()
+        self._by_estimate = {priority: _SortedPairs() for priority in PRIORITIES}
+        self._by_added = {priority: _SortedPairs() for priority in PRIORITIES}
+        # Lowercased description -> ids of active tasks, for exact-match lookups
+        self._by_description: Dict[str, List[str]] = {}
+        # Fuzzy token/trigram index over active task descriptions
+        self._text = TaskTextIndex()
+        self._archive = TaskArchive()
+        # Sparse: most tasks have no notes
+        self._notes: Dict[str, str] = {}
+        self.epoch = uuid.uuid4().hex[:12]
+        self.version = 0
+        self._changes: List[str] = []
+        self._changes_base = 0
+        self._listeners: List[Callable[[], None]] = []
+        for task in tasks:
+            self._put(task.id, task.description, task.priority, task.estimated_time_minutes,
+                      _to_micros(task.added_at), task.completed, task.notes)
+        self.journal = journal
+        if journal is not None:
+            journal.snapshot_source = self.records
+            journal.owner = self
+
+    @classmethod
+    def from_records(cls, records: Iterable[dict], journal: Optional[Journal] = None) -> "TaskStore":
+        """Loads journal records straight into the columns, without building Task objects."""
+        store = cls()
+        for record in records:
+            store._put(record["id"], record["description"], record["priority"], record["estimated_time_minutes"],
+                       _to_micros(record["added_at"]), record.get("completed", False), record.get("notes"))
+        store.journal = journal
+        if journal is not None:
+            journal.snapshot_source = store.records
+            journal.owner = store
+        return store
+
+    # Rows
+
+    def _put(self, task_id: str, description: str, priority: int, estimate: int, added: int, completed: bool,
+             notes: Optional[str] = None):
+        task_id = sys.intern(task_id)
+        description = sys.intern(description)
+        if notes:
+            self._notes[task_id] = notes
+        else:
+            self._notes.pop(task_id, None)
+        row = self._row.get(task_id)
+        if row is not None:
+            seq = self._seq[row]
+            self._unindex(row)
+            if not completed:
+                # Same task, new values: update the row in place
+                self._descriptions[row] = description
+                self._priority[row] = priority
+                self._estimate[row] = estimate
+                self._added[row] = added
+                self._index(row)
+                return
+            self._kill(row)
+            self._archive.add([task_id, description, priority, estimate, added, seq])
+            return
+
+        archived = self._archive.pop(task_id)
+        if completed:
+            seq = archived[5] if archived is not None else next(self._counter)
+            self._archive.add([task_id, description, priority, estimate, added, seq])
+            return
+        # New (or reactivated) tasks are appended, so rows stay in sequence order
+        row = len(self._ids)
+        self._ids.append(task_id)
+        self._descriptions.append(description)
+        self._priority.append(priority)
+        self._estimate.append(estimate)
+        self._added.append(added)
+        self._seq.append(next(self._counter))
+        self._live.append(1)
+        self._row[task_id] = row
+        self._index(row)
+
+    def _index(self, row: int):
+        priority, task_id, description = self._priority[row], self._ids[row], self._descriptions[row]
+        self._by_estimate[priority].insert(self._estimate[row], row)
+        self._by_added[priority].insert(self._added[row], row)
+        self._by_description.setdefault(description.strip().lower(), []).append(task_id)
+        self._text.add(task_id, description)
+
+    def _unindex(self, row: int):
+        priority, task_id, description = self._priority[row], self._ids[row], self._descriptions[row]
+        self._by_estimate[priority].remove(self._estimate[row], row)
+        self._by_added[priority].remove(self._added[row], row)
+        self._text.remove(task_id)
+        key = description.strip().lower()
+        ids = self._by_description.get(key)
+        if ids and task_id in ids:
+            ids.remove(task_id)
+            if not ids:
+                del self._by_description[key]
+
+    def _kill(self, row: int):
+        """Tombstones an (already unindexed) row; compacts once tombstones dominate."""
+        del self._row[self._ids[row]]
+        self._live[row] = 0
+        self._dead += 1
+        if self._dead >= _COMPACT_MIN_DEAD and self._dead > len(self._row):
+            self._compact()
+
+    def _compact(self):
+        keep = [row for row in range(len(self._ids)) if self._live[row]]
+        new_rows = array("q", [-1]) * len(self._ids)
+        for new_row, row in enumerate(keep):
+            new_rows[row] = new_row
+        self._ids = [self._ids[row] for row in keep]
+        self._descriptions = [self._descriptions[row] for row in keep]
+        for name in ("_priority", "_estimate", "_added", "_seq"):
+            column = getattr(self, name)
+            setattr(self, name, array(column.typecode, [column[row] for row in keep]))
+        self._live = bytearray(b"\x01") * len(keep)
+        self._row = {task_id: row for row, task_id in enumerate(self._ids)}
+        self._dead = 0
+        for index in (*self._by_estimate.values(), *self._by_added.values()):
+            index.remap(new_rows)
+
+    def _task(self, row: int) -> Task:
+        # Columns only ever hold validated values, so skip re-validation
+        task_id = self._ids[row]
+        return Task.model_construct(id=task_id, description=self._descriptions[row],
+                                    priority=self._priority[row], estimated_time_minutes=self._estimate[row],
+                                    added_at=_from_micros(self._added[row]), completed=False,
+                                    notes=self._notes.get(task_id))
+
+    def _archived_task(self, row: list) -> Task:
+        return Task.model_construct(id=row[0], description=row[1], priority=row[2], estimated_time_minutes=row[3],
+                                    added_at=_from_micros(row[4]), completed=True, notes=self._notes.get(row[0]))
+
+    def _all_rows(self) -> Iterator[tuple]:
+        """(seq, id, description, priority, estimate, added, completed) for every task, in insertion order."""
+        hot = ((self._seq[row], self._ids[row], self._descriptions[row], self._priority[row],
+                self._estimate[row], self._added[row], False)
+               for row in range(len(self._ids)) if self._live[row])
+        cold = sorted((row[5], row[0], row[1], row[2], row[3], row[4], True) for row in self._archive)
+        return heapq.merge(hot, cold)
+
+    def _log(self, op: dict):
+        """Journals a mutation and records it in the change history."""
+        if self.journal is not None:
+            self.journal.append(op)
+        self.version += 1
+        self._changes.append(op["task"]["id"] if op["op"] == "add" else op["id"])
+        if len(self._changes) > 2 * CHANGE_HISTORY:
+            drop = len(self._changes) - CHANGE_HISTORY
+            del self._changes[:drop]
+            self._changes_base += drop
+        for listener in self._listeners:
+            listener()
+
+    def add_listener(self, listener: Callable[[], None]):
+        """Calls `listener` after every mutation (under whatever lock the caller holds)."""
+        self._listeners.append(listener)
+
+    def changes_since(self, version: int) -> Optional[List[str]]:
+        """
+        Ids of tasks changed after `version`, each once, in order of their latest change.
+        None if `version` is ahead of this store or older than the retained history.
+        """
+        if version > self.version or version < self._changes_base:
+            return None
+        changed = self._changes[version - self._changes_base:]
+        return list(reversed(dict.fromkeys(reversed(changed))))
+
+    # Public API
+
+    def __len__(self) -> int:
+        return len(self._row) + len(self._archive)
+
+    def __iter__(self) -> Iterator[Task]:
+        """Iterates over all tasks (active and completed) in insertion order."""
+        for _, task_id, description, priority, estimate, added, completed in self._all_rows():
+            yield Task.model_construct(id=task_id, description=description, priority=priority,
+                                       estimated_time_minutes=estimate, added_at=_from_micros(added),
+                                       completed=completed, notes=self._notes.get(task_id))
+
+    def __contains__(self, task_id: str) -> bool:
+        return task_id in self._row or task_id in self._archive
+
+    def records(self) -> List[dict]:
+        """Every task as a journal record (the same shape as task_record), for snapshots."""
+        return [{"id": task_id, "description": description, "priority": priority,
+                 "estimated_time_minutes": estimate, "added_at": _from_micros(added).isoformat(),
+                 "completed": completed, "notes": self._notes.get(task_id)}
+                for _, task_id, description, priority, estimate, added, completed in self._all_rows()]
+
+    def add(self, task: Task) -> Task:
+        """Adds a task, replacing (and re-indexing) any existing task with the same id."""
+        self._put(task.id, task.description, task.priority, task.estimated_time_minutes,
+                  _to_micros(task.added_at), task.completed, task.notes)
+        self._log({"op": "add", "task": task.model_dump(mode="json")})
+        return task
+
+    def get(self, task_id: str) -> Optional[Task]:
+        row = self._row.get(task_id)
+        if row is not None:
+            return self._task(row)
+        archived = self._archive.get(task_id)
+        return self._archived_task(archived) if archived is not None else None
+
+    def complete(self, task_id: str) -> Optional[Task]:
+        """Marks an active task complete. Returns the task, or None if it is missing or already done."""
+        row = self._row.get(task_id)
+        if row is None:
+            return None
+        task = self._task(row)
+        task.completed = True
+        self._put(task_id, task.description, task.priority, task.estimated_time_minutes, self._added[row], True,
+                  task.notes)
+        self._log({"op": "complete", "id": task_id})
+        return task
+
+    def edit(self, task_id: str, **fields) -> Optional[Task]:
+        """Updates fields of a task (re-validated and re-indexed). Returns the updated task, or None if missing."""
+        task = self.get(task_id)
+        if task is None:
+            return None
+        updated = Task(**{**task.model_dump(), **fields, "id": task_id})
+        self._put(task_id, updated.description, updated.priority, updated.estimated_time_minutes,
+                  _to_micros(updated.added_at), updated.completed, updated.notes)
+        self._log({"op": "edit", "id": task_id, "fields": updated.model_dump(mode="json", include=set(fields))})
+        return updated
+
+    def delete(self, task_id: str) -> Optional[Task]:
+        """Removes a task (active or completed). Returns the removed task, or None if missing."""
+        task = self.get(task_id)
+        if task is None:
+            return None
+        row = self._row.get(task_id)
+        if row is not None:
+            self._unindex(row)
+            self._kill(row)
+        else:
+            self._archive.pop(task_id)
+        self._notes.pop(task_id, None)
+        self._log({"op": "delete", "id": task_id})
+        return task
+
+    def active_count(self) -> int:
+        return len(self._row)
+
+    def completed_count(self) -> int:
+        return len(self._archive)
+
+    def has_active(self) -> bool:
+        return bool(self._row)
+
+    def active_tasks(self) -> List[Task]:
+        """Active tasks ordered by (priority, added_at)."""
+        return [self._task(row) for priority in PRIORITIES for row in self._by_added[priority].rows]
+
+    def active_rows(self) -> List[Tuple[str, str, int, int]]:
+        """(id, description, priority, estimated_time_minutes) of active tasks in active_tasks() order, without building Tasks."""
+        return [(self._ids[row], self._descriptions[row], self._priority[row], self._estimate[row])
+                for priority in PRIORITIES for row in self._by_added[priority].rows]
+
+    def active_by_priority(self) -> List[Task]:
+        """Active tasks ordered by (priority, estimated_time_minutes)."""
+        return list(self.iter_active_by_priority())
+
+    def iter_active_by_priority(self, max_minutes: Optional[int] = None) -> Iterator[Task]:
+        """
+        Lazily yields active tasks in (priority, estimated_time_minutes) order, only those
+        estimated at max_minutes or less if given. Tasks are built as they are consumed.
+        """
+        for priority in PRIORITIES:
+            index = self._by_estimate[priority]
+            end = len(index) if max_minutes is None else bisect_right(index.keys, max_minutes)
+            for row in index.rows[:end]:
+                yield self._task(row)
+
+    def find_active_by_description(self, description: str) -> List[Task]:
+        """Active tasks whose description matches exactly (case-insensitive)."""
+        return [self._task(self._row[task_id]) for task_id in self._by_description.get(description.strip().lower(), ())]
+
+    def match_description(self, query: str) -> MatchResult:
+        """Fuzzy-matches query against active task descriptions (ranked, with an ambiguity flag)."""
+        return self._text.match(query)
+
+    def best_fit(self, available_minutes: int) -> Optional[Task]:
+        """
+        Returns the highest-priority active task that fits in available_minutes,
+        preferring the shortest estimate within a priority. One lookup per priority level.
+        """
+        for priority in PRIORITIES:
+            index = self._by_estimate[priority]
+            if index.keys and index.keys[0] <= available_minutes:
+                return self._task(index.rows[0])
+        return None
@@ -0,0 +1,205 @@
+import heapq
+import itertools
+import re
+import sys
+from typing import Collection, Dict, Hashable, List, Optional, Set, Tuple
+
+from pydantic import BaseModel
+
+_TOKEN = re.compile(r"\w+")
+# Scores are sums of float shares; differences closer than this count as equal
+SCORE_TOLERANCE = 1e-6
+
+
+def tokenize(text: str) -> List[str]:
+    return _TOKEN.findall(text.lower())
+
+
+def trigrams(tokens: List[str]) -> Set[str]:
+    """Trigrams of each padded token, so word order doesn't matter but small typos still overlap."""
+    grams = set()
+    for token in tokens:
+        padded = f" {token} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def token_key(tokens) -> str:
+    """Order-insensitive key for a set of tokens, so "milk buy" finds "Buy milk"."""
+    return " ".join(sorted(set(tokens)))
+
+
+class TaskMatch(BaseModel):
+    task_id: str
+    description: str
+    score: float
+
+
+class MatchResult(BaseModel):
+    best: Optional[TaskMatch] = None
+    candidates: List[TaskMatch] = []
+    ambiguous: bool = False
+
+
+class TaskTextIndex:
+    """
+    Fuzzy index over task descriptions: a token inverted index plus a trigram index.
+
+    A query with exactly a task's words (in any order) is looked up directly and always
+    wins. Otherwise candidates are the tasks containing every word of the query or, for
+    misspelt words, those in the query's rarest token and trigram postings; each is
+    scored by how much of the query's trigrams it covers, blended with the share of
+    query words present verbatim and the trigram Jaccard similarity so exact and tighter
+    matches rank first. At most about `max_postings` candidates are scored per query, so
+    lookups stay fast when every word is common. Updated incrementally as tasks are
+    added or completed.
+    """
+
+    def __init__(self, min_score: float = 0.5, ambiguity_margin: float = 0.1, max_postings: int = 256):
+        self.min_score = min_score
+        self.ambiguity_margin = ambiguity_margin
+        # Postings longer than this don't generate candidates (unless nothing else matches)
+        self.max_postings = max_postings
+        self._descriptions: Dict[str, str] = {}
+        # Per-task tokens/trigrams as tuples of interned strings: a fraction of the memory of sets
+        self._grams: Dict[str, Tuple[str, ...]] = {}
+        self._tokens: Dict[str, Tuple[str, ...]] = {}
+        self._by_token: Dict[str, Set[str]] = {}
+        self._by_gram: Dict[str, Set[str]] = {}
+        self._by_key: Dict[str, Set[str]] = {}
+        # Task ids by trigram count, to walk tasks from shortest to longest
+        self._by_size: Dict[int, Set[str]] = {}
+
+    def __len__(self) -> int:
+        return len(self._descriptions)
+
+    def add(self, task_id: str, description: str):
+        if task_id in self._descriptions:
+            self.remove(task_id)
+        tokens = tuple(sys.intern(token) for token in set(tokenize(description)))
+        grams = tuple(sys.intern(gram) for gram in trigrams(tokens))
+        self._descriptions[task_id] = description
+        self._grams[task_id] = grams
+        self._by_size.setdefault(len(grams), set()).add(task_id)
+        self._tokens[task_id] = tokens
+        self._by_key.setdefault(token_key(tokens), set()).add(task_id)
+        for token in tokens:
+            self._by_token.setdefault(token, set()).add(task_id)
+        for gram in grams:
+            self._by_gram.setdefault(gram, set()).add(task_id)
+
+    def remove(self, task_id: str):
+        description = self._descriptions.pop(task_id, None)
+        if description is None:
+            return
+        tokens = self._tokens.pop(task_id)
+        self._discard(self._by_key, token_key(tokens), task_id)
+        for token in tokens:
+            self._discard(self._by_token, token, task_id)
+        grams = self._grams.pop(task_id)
+        self._discard(self._by_size, len(grams), task_id)
+        for gram in grams:
+            self._discard(self._by_gram, gram, task_id)
+
+    def _size(self, task_id: str) -> int:
+        return len(self._grams[task_id])
+
+    @staticmethod
+    def _discard(index: Dict[Hashable, Set[str]], key: Hashable, task_id: str):
+        ids = index.get(key)
+        if ids is not None:
+            ids.discard(task_id)
+            if not ids:
+                del index[key]
+
+    def search(self, query: str, limit: int = 5) -> List[TaskMatch]:
+        """Ranked matches scoring at least min_score, best first."""
+        tokens = tokenize(query)
+        query_grams = trigrams(tokens)
+        if not query_grams:
+            return []
+        query_tokens = set(tokens)
+        candidates = self._containing_all(query_tokens, limit)
+        if candidates is None:
+            candidates = self._fuzzy_candidates(query_tokens, query_grams)
+
+        scored = []
+        for task_id in candidates:
+            grams = self._grams[task_id]
+            shared = len(query_grams.intersection(grams))
+            coverage = shared / len(query_grams)
+            jaccard = shared / (len(query_grams) + len(grams) - shared)
+            exact = len(query_tokens.intersection(self._tokens[task_id])) / len(query_tokens)
+            score = 0.5 * coverage + 0.3 * exact + 0.2 * jaccard
+            if score >= self.min_score:
+                scored.append((score, task_id))
+        return [TaskMatch(task_id=task_id, description=self._descriptions[task_id], score=round(score, 4))
+                for score, task_id in heapq.nlargest(limit, scored)]
+
+    def _containing_all(self, query_tokens: Set[str], limit: int) -> Optional[Collection[str]]:
+        """
+        Tasks containing every word of the query, or None if no task does. These outrank the
+        rest on verbatim words and among themselves differ only in the Jaccard term, which
+        falls as a task gets longer; so when the words are too common to intersect cheaply,
+        tasks are walked from the fewest trigrams up and only the first `limit` are kept.
+        """
+        postings = [self._by_token.get(token) for token in query_tokens]
+        if not all(postings):
+            return None
+        postings.sort(key=len)
+        containing = postings[0].intersection(*postings[1:])
+        if len(containing) <= self.max_postings:
+            return heapq.nsmallest(limit, containing, key=self._size) or None
+        found = []
+        min_size = len(trigrams(query_tokens))
+        for size in sorted(self._by_size):
+            if size >= min_size:
+                found.extend(self._by_size[size].intersection(containing))
+                if len(found) >= limit:
+                    break
+        return found
+
+    def _fuzzy_candidates(self, query_tokens: Set[str], query_grams: Set[str]) -> Set[str]:
+        """
+        Candidates for a query with a misspelt word, or whose words no one task has: tasks in
+        the query's selective postings, rarest first, until about max_postings are found. If
+        every posting is too long, the tasks sharing as many of the query's words (then the
+        misspelt words' trigrams) as possible, intersected rarest first, at most max_postings.
+        """
+        token_postings = [self._by_token[token] for token in query_tokens if token in self._by_token]
+        gram_postings = [self._by_gram[gram] for gram in query_grams if gram in self._by_gram]
+        candidates = set()
+        for ids in sorted(token_postings + gram_postings, key=len):
+            if len(ids) > self.max_postings or len(candidates) >= self.max_postings:
+                break
+            candidates |= ids
+        if candidates or not gram_postings:
+            return candidates
+        # A known word's trigrams only repeat its own posting, so they can't narrow any further
+        misspelt_grams = trigrams([token for token in query_tokens if token not in self._by_token])
+        narrowing = sorted(token_postings, key=len) + sorted(
+            (self._by_gram[gram] for gram in misspelt_grams if gram in self._by_gram), key=len)
+        candidates = narrowing[0]
+        for ids in narrowing[1:]:
+            if len(candidates) <= self.max_postings:
+                return candidates
+            candidates = candidates & ids or candidates
+        return set(itertools.islice(candidates, self.max_postings))
+
+    def match(self, query: str, limit: int = 5) -> MatchResult:
+        """
+        Best match: a task with exactly the query's words, otherwise the top-scoring one,
+        flagged ambiguous when the runner-up scores within ambiguity_margin.
+        """
+        exact = self._by_key.get(token_key(tokenize(query)))
+        if exact:
+            task_id = min(exact)
+            best = TaskMatch(task_id=task_id, description=self._descriptions[task_id], score=1.0)
+            return MatchResult(best=best, candidates=[best])
+        candidates = self.search(query, limit)
+        if not candidates:
+            return MatchResult()
+        top = candidates[0].score
+        ambiguous = (len(candidates) > 1 and top < 1.0 - SCORE_TOLERANCE
+                     and top - candidates[1].score < self.ambiguity_margin - SCORE_TOLERANCE)
+        return MatchResult(best=None if ambiguous else candidates[0], candidates=candidates, ambiguous=ambiguous)
@@ -0,0 +1,115 @@
+import re
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Optional
+
+from .calendar_index import CalendarIndex
+from .core import database_dir, task_journal, calendar_journal, load_task_records, load_calendar
+from .instrumentation import logger
+from .persistence import Journal
+from .task_store import TaskStore
+
+DEFAULT_USER_ID = "default"
+_VALID_USER_ID = re.compile(r"[A-Za-z0-9_\-]{1,64}")
+
+
+class UserSession:
+    """One user's task store and calendar, plus the lock that serializes access to them."""
+
+    def __init__(self, user_id: str, tasks: TaskStore, calendar: CalendarIndex):
+        self.user_id = user_id
+        self.tasks = tasks
+        self.calendar = calendar
+        self.lock = threading.RLock()
+        # SuggestionCache attached by the agent on the user's first suggestion
+        self.suggestions = None
+
+    def close(self):
+        for journal in (self.tasks.journal, self.calendar.journal):
+            if journal is not None:
+                journal.close()
+
+
+class UserRegistry:
+    """
+    Per-user stores, loaded lazily on a user's first request and kept in an LRU.
+
+    When more than `max_users` sessions are loaded, the least recently used idle
+    session is synced to disk and dropped; it is replayed from its journal the next
+    time that user shows up. The default user keeps the original app/database files;
+    every other user gets its own directory under app/database/users/.
+    """
+
+    def __init__(self, max_users: int = 1000, directory: Path = database_dir / "users"):
+        self.max_users = max_users
+        self.directory = Path(directory)
+        self._sessions: "OrderedDict[str, UserSession]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def _journals(self, user_id: str):
+        if user_id == DEFAULT_USER_ID:
+            return task_journal, calendar_journal
+        user_dir = self.directory / user_id
+        return Journal(user_dir, "tasks"), Journal(user_dir, "calendar")
+
+    def _load(self, user_id: str) -> UserSession:
+        tasks_journal, events_journal = self._journals(user_id)
+        return UserSession(user_id,
+                           TaskStore.from_records(load_task_records(tasks_journal), journal=tasks_journal),
+                           CalendarIndex(load_calendar(events_journal), journal=events_journal))
+
+    def get(self, user_id: Optional[str] = None) -> UserSession:
+        """Returns the session for user_id (the default user if None), loading it if needed."""
+        user_id = user_id or DEFAULT_USER_ID
+        if not _VALID_USER_ID.fullmatch(user_id):
+            raise ValueError(f"Invalid user id: {user_id!r}")
+        with self._lock:
+            session = self._sessions.get(user_id)
+            if session is not None:
+                self._sessions.move_to_end(user_id)
+                return session
+        # Load outside the registry lock so one slow replay doesn't block other users
+        loaded = self._load(user_id)
+        with self._lock:
+            session = self._sessions.setdefault(user_id, loaded)
+            self._sessions.move_to_end(user_id)
+            self._evict_idle(keep=user_id)
+        return session
+
+    @contextmanager
+    def locked(self, user_id: Optional[str] = None):
+        """Yields the user's session with its lock held, retrying if it was evicted in between."""
+        while True:
+            session = self.get(user_id)
+            with session.lock:
+                if self._sessions.get(session.user_id) is session:
+                    yield session
+                    return
+
+    def _evict_idle(self, keep: str):
+        # Skip sessions whose lock is held: they are in the middle of a turn
+        for user_id in list(self._sessions):
+            if len(self._sessions) <= self.max_users:
+                break
+            if user_id == keep:
+                continue
+            session = self._sessions[user_id]
+            if not session.lock.acquire(blocking=False):
+                continue
+            try:
+                del self._sessions[user_id]
+                session.close()
+            finally:
+                session.lock.release()
+            logger.info("Evicted idle user session: %s", user_id)
+
+    def close(self):
+        with self._lock:
+            for session in self._sessions.values():
+                session.close()
+            self._sessions.clear()
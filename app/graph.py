@@ -0,0 +1,178 @@
+from agent import (parse_user_input, aparse_user_input, add_task_to_list, complete_task_by_id,
+                   suggest_task, plan_day, format_response, astream_free_text_reply)
+from core import AgentState, logger
+
+import asyncio
+import os
+from typing import AsyncIterator, Optional
+from langchain_core.runnables import RunnableLambda
+from langgraph.graph import StateGraph, END
+
+
+# Routing functions for the conditional edges
+
+def route_after_parse(state: AgentState) -> str:
+    intent = state.get('intent')
+    if intent == 'add_task':
+        return "add_task_to_list"
+    if intent == 'complete_task_by_id':
+        return "complete_task_by_id"
+    if intent == 'suggest_task':
+        return "suggest_task"
+    if intent == 'plan_day':
+        return "plan_day"
+    return "format_response"
+
+def route_after_add(state: AgentState) -> str:
+    return "suggest_task" if state.get('intent') == 'suggest_task_after_add' else "format_response"
+
+def route_after_complete(state: AgentState) -> str:
+    return "suggest_task" if state.get('intent') == 'task_completed_suggest_next' else "format_response"
+
+
+def build_graph():
+    """Wires the FocusFlow nodes into a StateGraph and compiles it."""
+    graph = StateGraph(AgentState)
+    # parse_user_input awaits the LLM under ainvoke; the other nodes are CPU-only
+    graph.add_node("parse_user_input", RunnableLambda(parse_user_input, afunc=aparse_user_input))
+    graph.add_node("add_task_to_list", add_task_to_list)
+    graph.add_node("complete_task_by_id", complete_task_by_id)
+    graph.add_node("suggest_task", suggest_task)
+    graph.add_node("plan_day", plan_day)
+    graph.add_node("format_response", format_response)
+
+    graph.set_entry_point("parse_user_input")
+    graph.add_conditional_edges("parse_user_input", route_after_parse,
+                                ["add_task_to_list", "complete_task_by_id", "suggest_task", "plan_day", "format_response"])
+    graph.add_conditional_edges("add_task_to_list", route_after_add, ["suggest_task", "format_response"])
+    graph.add_conditional_edges("complete_task_by_id", route_after_complete, ["suggest_task", "format_response"])
+    graph.add_edge("suggest_task", "format_response")
+    graph.add_edge("plan_day", "format_response")
+    graph.add_edge("format_response", END)
+    return graph.compile()
+
+
+# Compiled once at import and shared by every conversation turn
+app = build_graph()
+
+
+def initial_state(user_input: Optional[str] = None, task_id_to_complete: Optional[str] = None,
+                  user_id: Optional[str] = None) -> AgentState:
+    return {
+        'user_id': user_id,
+        'user_input': user_input,
+        'task_id_to_complete': task_id_to_complete,
+        'intent': "",
+        'extracted_task_info': None,
+        'suggestion': None,
+        'next_event_info': None,
+        'schedule': None,
+        'response': "",
+        'error': None,
+    }
+
+def run_turn(user_input: Optional[str] = None, task_id_to_complete: Optional[str] = None,
+             user_id: Optional[str] = None) -> AgentState:
+    """Runs one conversation turn for user_id (the default user if None) through the compiled graph."""
+    return app.invoke(initial_state(user_input, task_id_to_complete, user_id))
+
+async def arun_turn(user_input: Optional[str] = None, task_id_to_complete: Optional[str] = None,
+                    user_id: Optional[str] = None) -> AgentState:
+    """Async version of run_turn; many turns can be awaited concurrently in one process."""
+    return await app.ainvoke(initial_state(user_input, task_id_to_complete, user_id))
+
+
+# Streaming
+
+def progress_event(node: str, state: AgentState) -> Optional[dict]:
+    """Maps a finished node to the progress event the UI shows while the turn continues."""
+    if state.get('error'):
+        return {"type": "progress", "stage": "error", "message": state['error']}
+    if node == "parse_user_input":
+        return {"type": "progress", "stage": "intent_recognized", "intent": state.get('intent')}
+    if node == "add_task_to_list":
+        return {"type": "progress", "stage": "task_added", "message": state.get('response')}
+    if node == "complete_task_by_id":
+        return {"type": "progress", "stage": "task_completed", "message": state.get('response')}
+    if node == "suggest_task":
+        suggestion = state.get('suggestion')
+        return {"type": "progress", "stage": "suggestion_computed",
+                "task_id": suggestion.id if suggestion else None, "message": state.get('response')}
+    if node == "plan_day":
+        return {"type": "progress", "stage": "day_planned", "scheduled": len(state.get('schedule') or []),
+                "message": state.get('response')}
+    return None
+
+# Set FOCUSFLOW_SPECULATIVE_REPLY_MS to start a free-text reply speculatively once parsing has run
+# this long (i.e. it is waiting on the LLM), so a reply that turns out to be needed has its first
+# tokens ready. Off by default: every turn that waits on the LLM then also opens a full-tier stream,
+# which is thrown away (but still billed and rate limited) whenever the request is actionable.
+SPECULATIVE_REPLY_AFTER_S = float(os.getenv("FOCUSFLOW_SPECULATIVE_REPLY_MS", "-1")) / 1000
+
+class SpeculativeReply:
+    """
+    A free-text reply streamed in the background after `delay_s` (or as soon as the turn
+    asks for it), buffered until the turn reads it.
+    """
+
+    def __init__(self, user_input: str, delay_s: float):
+        self._texts: asyncio.Queue = asyncio.Queue()
+        self._needed = asyncio.Event()
+        self._task = asyncio.create_task(self._run(user_input, delay_s))
+
+    async def _run(self, user_input: str, delay_s: float):
+        try:
+            try:
+                await asyncio.wait_for(self._needed.wait(), delay_s)
+            except asyncio.TimeoutError:
+                pass
+            async for text in astream_free_text_reply(user_input):
+                self._texts.put_nowait(text)
+        except Exception as e:
+            logger.warning("Free-text reply failed: %s", e)
+        finally:
+            self._texts.put_nowait(None)
+
+    async def texts(self) -> AsyncIterator[str]:
+        self._needed.set()
+        while (text := await self._texts.get()) is not None:
+            yield text
+
+    def cancel(self):
+        self._task.cancel()
+
+async def astream_turn(user_input: Optional[str] = None, task_id_to_complete: Optional[str] = None,
+                       user_id: Optional[str] = None) -> AsyncIterator[dict]:
+    """
+    Runs one turn and yields events as they happen: "received" straight away, a progress
+    event after each node, "token" events while a free-text reply streams from the llm,
+    and a final "response".
+    """
+    yield {"type": "progress", "stage": "received"}
+    speculative = (SpeculativeReply(user_input, SPECULATIVE_REPLY_AFTER_S)
+                   if user_input and SPECULATIVE_REPLY_AFTER_S >= 0 else None)
+    try:
+        final_state = None
+        async for update in app.astream(initial_state(user_input, task_id_to_complete, user_id), stream_mode="updates"):
+            for node, state in update.items():
+                if node == "parse_user_input" and speculative and (state.get('intent') != 'unknown' or state.get('error')):
+                    speculative.cancel()
+                    speculative = None
+                event = progress_event(node, state)
+                if event:
+                    yield event
+                final_state = state
+
+        # Requests no node could act on get a conversational reply, streamed token by token
+        if final_state.get('intent') == 'unknown' and not final_state.get('error') and user_input:
+            parts = []
+            async for text in (speculative.texts() if speculative else astream_free_text_reply(user_input)):
+                parts.append(text)
+                yield {"type": "token", "text": text}
+            if parts:
+                final_state['response'] = "".join(parts)
+
+        yield {"type": "response", "text": final_state.get('response'), "intent": final_state.get('intent')}
+    finally:
+        if speculative:
+            speculative.cancel()
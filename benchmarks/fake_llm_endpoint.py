@@ -0,0 +1,247 @@
+"""
+Local fake LLM endpoint for exercising the LLM dispatcher under load, with no network.
+
+FakeEndpoint is an HTTP server that answers intent-parsing prompts the way the
+stub LLM does, after a configurable latency, and enforces its own rate limit:
+past `rate` requests per second it answers 429 with a Retry-After header, like
+the real quota. FakeEndpointLLM is a client for it that keeps a pool of
+keep-alive connections, exposing the `with_structured_output(...)` surface the
+agent uses (invoke/ainvoke/batch).
+
+Running this file drives many concurrent turns through agent.llm_dispatchers
+against the fake endpoint and prints the dispatcher and server stats as JSON:
+
+    python benchmarks/fake_llm_endpoint.py --turns 500 --server-rate 50 --latency-ms 200
+"""
+import argparse
+import asyncio
+import http.client
+import json
+import os
+import queue
+import statistics
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT / "app"))
+sys.path.insert(0, str(REPO_ROOT / "benchmarks"))
+
+from stub_llm import StubMessage, StubStructuredLLM, prompt_text  # noqa: E402
+
+
+class FakeEndpoint:
+    """POST /generate {"prompt": ...} -> {"parsed": ..., "usage": ...}, or 429 over `rate` requests/s."""
+
+    def __init__(self, schema, latency_ms: float = 200.0, rate: float = 50.0, port: int = 0):
+        self.parser = StubStructuredLLM(schema, 0.0)
+        self.latency_s = latency_ms / 1000.0
+        self.rate = rate
+        self.served = 0
+        self.rejected = 0
+        self.connections = 0
+        self._window_start = time.monotonic()
+        self._window_count = 0
+        self._lock = threading.Lock()
+        endpoint = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # keep-alive, so clients can reuse connections
+
+            def setup(self):
+                super().setup()
+                with endpoint._lock:
+                    endpoint.connections += 1
+
+            def do_POST(self):
+                prompt = json.loads(self.rfile.read(int(self.headers["Content-Length"])))["prompt"]
+                if not endpoint._admit():
+                    self._reply(429, {"error": "quota exceeded"}, {"Retry-After": "1"})
+                    return
+                time.sleep(endpoint.latency_s)
+                parsed = endpoint.parser._result(prompt)
+                usage = {"input_tokens": len(prompt_text(prompt)) // 4, "output_tokens": len(parsed.model_dump_json()) // 4}
+                self._reply(200, {"parsed": parsed.model_dump(mode="json"), "usage": usage})
+
+            def _reply(self, status: int, payload: dict, headers: dict = None):
+                body = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+        self.server.daemon_threads = True
+        self.port = self.server.server_address[1]
+
+    def _admit(self) -> bool:
+        # Fixed one-second windows are close enough to how the real quota behaves
+        with self._lock:
+            now = time.monotonic()
+            if now - self._window_start >= 1.0:
+                self._window_start, self._window_count = now, 0
+            if self._window_count >= self.rate:
+                self.rejected += 1
+                return False
+            self._window_count += 1
+            self.served += 1
+            return True
+
+    def start(self):
+        threading.Thread(target=self.server.serve_forever, name="fake-llm-endpoint", daemon=True).start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def stats(self) -> dict:
+        return {"served": self.served, "rejected": self.rejected, "connections": self.connections}
+
+
+class FakeEndpointError(Exception):
+    def __init__(self, status_code: int, retry_after: float = None):
+        super().__init__(f"fake endpoint answered {status_code}")
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+class ConnectionPool:
+    """Keep-alive HTTP connections to one host, checked out per request and returned afterwards."""
+
+    def __init__(self, host: str, port: int, size: int = 8, timeout: float = 30.0):
+        self.host, self.port, self.timeout = host, port, timeout
+        self._idle: "queue.LifoQueue[http.client.HTTPConnection]" = queue.LifoQueue(maxsize=size)
+        self.opened = 0
+
+    def request(self, method: str, path: str, body: bytes, headers: dict):
+        try:
+            connection = self._idle.get_nowait()
+        except queue.Empty:
+            connection = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+            self.opened += 1
+        try:
+            connection.request(method, path, body, headers)
+            response = connection.getresponse()
+            payload = response.read()
+        except Exception:
+            connection.close()
+            raise
+        try:
+            self._idle.put_nowait(connection)
+        except queue.Full:
+            connection.close()
+        return response, payload
+
+
+class FakeEndpointLLM:
+    def __init__(self, port: int, pool_size: int = 8):
+        self.pool = ConnectionPool("127.0.0.1", port, pool_size)
+        self._executor = ThreadPoolExecutor(max_workers=pool_size, thread_name_prefix="fake-llm-client")
+
+    def with_structured_output(self, schema, include_raw: bool = False):
+        return _FakeStructuredLLM(self, schema, include_raw)
+
+
+class _FakeStructuredLLM:
+    def __init__(self, client: FakeEndpointLLM, schema, include_raw: bool):
+        self.client = client
+        self.schema = schema
+        self.include_raw = include_raw
+
+    def invoke(self, prompt):
+        response, payload = self.client.pool.request("POST", "/generate", json.dumps({"prompt": prompt}).encode(),
+                                                     {"Content-Type": "application/json"})
+        if response.status != 200:
+            raise FakeEndpointError(response.status, float(response.getheader("Retry-After") or 0) or None)
+        data = json.loads(payload)
+        parsed = self.schema.model_validate(data["parsed"])
+        if not self.include_raw:
+            return parsed
+        return {"raw": StubMessage(data["usage"]), "parsed": parsed, "parsing_error": None}
+
+    async def ainvoke(self, prompt):
+        return await asyncio.get_running_loop().run_in_executor(self.client._executor, self.invoke, prompt)
+
+    def batch(self, prompts, return_exceptions: bool = False):
+        def call(prompt):
+            try:
+                return self.invoke(prompt)
+            except Exception as e:
+                if not return_exceptions:
+                    raise
+                return e
+        return list(self.client._executor.map(call, prompts))
+
+
+async def drive(turns: int, distinct: int, user_id: str):
+    import graph
+    latencies = []
+
+    async def turn(i: int):
+        start = time.perf_counter()
+        await graph.arun_turn(f"add load test errand {i % distinct}", user_id=user_id)
+        latencies.append(time.perf_counter() - start)
+
+    await asyncio.gather(*(turn(i) for i in range(turns)))
+    latencies.sort()
+    return {"turns": turns, "p50_ms": latencies[len(latencies) // 2] * 1000,
+            "p95_ms": latencies[int(len(latencies) * 0.95)] * 1000, "mean_ms": statistics.fmean(latencies) * 1000}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, default=500)
+    parser.add_argument("--distinct", type=int, default=400, help="distinct prompts among the turns (the rest coalesce)")
+    parser.add_argument("--latency-ms", type=float, default=200.0)
+    parser.add_argument("--server-rate", type=float, default=50.0, help="requests/s the fake endpoint accepts")
+    parser.add_argument("--client-rate", type=float, default=40.0, help="dispatcher token bucket rate")
+    parser.add_argument("--max-concurrency", type=int, default=16)
+    args = parser.parse_args()
+
+    import tempfile
+    os.chdir(REPO_ROOT)
+    import agent
+    from core import LLMDispatcher, UserRegistry
+
+    endpoint = None
+    with tempfile.TemporaryDirectory() as tmp:
+        agent.user_registry = UserRegistry(directory=Path(tmp))
+        endpoint = FakeEndpoint(agent.UserIntent, args.latency_ms, args.server_rate).start()
+        client = FakeEndpointLLM(endpoint.port, pool_size=args.max_concurrency)
+        agent.llm.set(client)
+        for tier in agent.intent_models:
+            agent.intent_models[tier].set(client)
+            agent.structured_llms[tier].reset()
+        agent.intent_cache.clear()
+        agent.llm_dispatchers = {tier: LLMDispatcher(agent.structured_llms[tier].get, max_concurrency=args.max_concurrency,
+                                                    rate_per_second=args.client_rate)
+                                for tier in agent.intent_models}
+        started = time.perf_counter()
+        turns = asyncio.run(drive(args.turns, args.distinct, "loadtest"))
+        report = {
+            "wall_s": round(time.perf_counter() - started, 3),
+            "turns": turns,
+            "dispatchers": {tier: dispatcher.stats() for tier, dispatcher in agent.llm_dispatchers.items()},
+            "endpoint": endpoint.stats(),
+            "client_connections_opened": agent.llm.get().pool.opened,
+        }
+        for dispatcher in agent.llm_dispatchers.values():
+            dispatcher.close()
+        endpoint.stop()
+        agent.user_registry.close()
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
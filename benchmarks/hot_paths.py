@@ -0,0 +1,165 @@
+"""
+Benchmarks for the agent hot paths on synthetic data, with a local stub LLM.
+
+Generates task lists and calendars of each requested size in a temporary
+directory, then times load_tasks/save_tasks, find_next_available_slot,
+suggest_task, list_tasks formatting, complete_task_by_id and the full node
+chain end to end. Results are written as JSON (tagged with the git commit) so
+runs can be compared across commits. No network access is needed.
+
+    python benchmarks/hot_paths.py --tasks 1000 100000 --events 10 1000 --output bench.json
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT / "app"))
+sys.path.insert(0, str(REPO_ROOT / "benchmarks"))
+# core.py resolves app/database relative to the working directory
+os.chdir(REPO_ROOT)
+
+import agent  # noqa: E402
+import graph  # noqa: E402
+from core import CalendarEvent, Journal, LLMDispatcher, Task, UserRegistry, load_tasks, save_tasks, save_calendar  # noqa: E402
+from stub_llm import StubLLM  # noqa: E402
+
+WORDS = ("review", "draft", "email", "report", "plan", "call", "fix", "update", "prepare", "read",
+         "budget", "slides", "team", "client", "invoice", "groceries", "laundry", "proposal", "notes", "trip")
+
+
+def synthetic_tasks(count: int, rng: random.Random):
+    start = datetime.now() - timedelta(days=365)
+    return [Task(description=" ".join(rng.choices(WORDS, k=3)) + f" #{i}",
+                 priority=rng.randint(1, 5),
+                 estimated_time_minutes=rng.choice((5, 10, 15, 20, 30, 45, 60, 90, 120, 180)),
+                 added_at=start + timedelta(minutes=i),
+                 completed=rng.random() < 0.3)
+            for i in range(count)]
+
+
+def synthetic_events(count: int, rng: random.Random):
+    # Spread around now so the free-slot search sees both past and upcoming meetings
+    now = datetime.now().replace(second=0, microsecond=0)
+    events = []
+    for i in range(count):
+        start = now + timedelta(minutes=rng.randint(-count * 30, count * 30))
+        events.append(CalendarEvent(start_time=start, end_time=start + timedelta(minutes=rng.choice((15, 30, 45, 60, 90, 120))),
+                                    summary=f"Meeting {i}"))
+    return events
+
+
+def time_calls(fn, iterations: int) -> dict:
+    samples = []
+    for i in range(iterations):
+        start = time.perf_counter()
+        fn(i)
+        samples.append(time.perf_counter() - start)
+    samples.sort()
+    return {
+        "iterations": iterations,
+        "mean_ms": statistics.fmean(samples) * 1000,
+        "p50_ms": samples[len(samples) // 2] * 1000,
+        "p95_ms": samples[min(len(samples) - 1, int(len(samples) * 0.95))] * 1000,
+        "min_ms": samples[0] * 1000,
+    }
+
+
+def bench_size(task_count: int, event_count: int, iterations: int, llm_latency_ms: float, seed: int) -> dict:
+    rng = random.Random(seed)
+    tasks = synthetic_tasks(task_count, rng)
+    events = synthetic_events(event_count, rng)
+    results = {"tasks": task_count, "events": event_count}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        user_id = "bench"
+        user_dir = Path(tmp) / user_id
+        tasks_journal, events_journal = Journal(user_dir, "tasks"), Journal(user_dir, "calendar")
+
+        start = time.perf_counter()
+        save_tasks(tasks, tasks_journal)
+        results["save_tasks_ms"] = (time.perf_counter() - start) * 1000
+        save_calendar(events, events_journal)
+        start = time.perf_counter()
+        load_tasks(tasks_journal)
+        results["load_tasks_ms"] = (time.perf_counter() - start) * 1000
+
+        agent.user_registry = UserRegistry(directory=Path(tmp))
+        start = time.perf_counter()
+        session = agent.user_registry.get(user_id)
+        results["load_session_ms"] = (time.perf_counter() - start) * 1000
+
+        agent.llm.set(StubLLM(llm_latency_ms))
+        for tier in agent.intent_models:
+            agent.intent_models[tier].set(StubLLM(llm_latency_ms))
+            agent.structured_llms[tier].reset()
+        agent.intent_cache.clear()
+        # Measure the agent, not the production rate limit
+        agent.llm_dispatchers = {tier: LLMDispatcher(agent.structured_llms[tier].get, rate_per_second=1e6)
+                                 for tier in agent.intent_models}
+        active_ids = [task.id for task in session.tasks.active_tasks()]
+        rng.shuffle(active_ids)
+
+        results["find_next_available_slot"] = time_calls(
+            lambda i: agent.find_next_available_slot(session.calendar), iterations)
+        results["suggest_task"] = time_calls(
+            lambda i: agent.suggest_task(graph.initial_state(user_id=user_id)), iterations)
+        results["list_tasks_response"] = time_calls(
+            lambda i: agent.list_tasks_response(session.tasks), max(1, iterations // 10))
+        results["complete_task_by_id"] = time_calls(
+            lambda i: agent.complete_task_by_id(graph.initial_state(task_id_to_complete=active_ids[i % len(active_ids)], user_id=user_id)),
+            min(iterations, len(active_ids)))
+        results["end_to_end_add_task"] = time_calls(
+            lambda i: graph.run_turn(f"add benchmark errand number {i}", user_id=user_id), iterations)
+        results["end_to_end_suggest_task"] = time_calls(
+            lambda i: graph.run_turn("suggest a task", user_id=user_id), iterations)
+        for dispatcher in agent.llm_dispatchers.values():
+            dispatcher.close()
+        agent.user_registry.close()
+    return results
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=REPO_ROOT, capture_output=True, text=True).stdout.strip()
+    except OSError:
+        return "unknown"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tasks", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--events", type=int, nargs="+", default=[10, 1000])
+    parser.add_argument("--iterations", type=int, default=50)
+    parser.add_argument("--llm-latency-ms", type=float, default=0.0, help="simulated latency of each stub LLM call")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", type=Path, help="write JSON results here instead of stdout")
+    args = parser.parse_args()
+
+    report = {
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "llm_latency_ms": args.llm_latency_ms,
+        "results": [bench_size(task_count, event_count, args.iterations, args.llm_latency_ms, args.seed)
+                    for task_count in args.tasks for event_count in args.events],
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        args.output.write_text(text)
+        print(f"Wrote {args.output}")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
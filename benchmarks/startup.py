@@ -0,0 +1,79 @@
+"""
+Cold-start benchmark: times importing the agent, compiling the graph, the first
+(fast-path) response and, optionally, the first response that needs the LLM.
+
+Each run happens in a fresh interpreter so import caches don't hide the cost.
+
+    python benchmarks/startup.py --runs 5
+    python benchmarks/startup.py --runs 3 --llm   # also times LLM client creation + first LLM call
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+# Runs inside the child interpreter, from the repo root (core.py paths are relative to it).
+# Turns run as a throwaway user in a temporary directory, so the real app/database files
+# (the default user's) are never migrated or written to.
+CHILD = r"""
+import json, sys, tempfile, time
+from pathlib import Path
+t0 = time.perf_counter()
+sys.path.insert(0, "app")
+import agent
+t1 = time.perf_counter()
+import graph
+t2 = time.perf_counter()
+from core import UserRegistry
+tmp = tempfile.TemporaryDirectory()
+agent.user_registry = UserRegistry(directory=Path(tmp.name))
+graph.run_turn("list tasks", user_id="startup-bench")
+t3 = time.perf_counter()
+result = {
+    "import_agent_s": t1 - t0,
+    "compile_graph_s": t2 - t1,
+    "first_response_s": t3 - t2,
+    "heavy_sdks_loaded_before_llm": sorted(m for m in ("vertexai", "langchain_google_genai") if m in sys.modules),
+}
+if WITH_LLM:
+    graph.run_turn("add a reminder to water the plants", user_id="startup-bench")
+    result["first_llm_response_s"] = time.perf_counter() - t3
+result["total_s"] = time.perf_counter() - t0
+agent.user_registry.close()
+tmp.cleanup()
+print("BENCH_RESULT " + json.dumps(result))
+"""
+
+
+def run_once(with_llm: bool) -> dict:
+    code = CHILD.replace("WITH_LLM", repr(with_llm))
+    proc = subprocess.run([sys.executable, "-c", code], cwd=REPO_ROOT, capture_output=True, text=True)
+    for line in proc.stdout.splitlines():
+        if line.startswith("BENCH_RESULT "):
+            return json.loads(line[len("BENCH_RESULT "):])
+    raise RuntimeError(f"Benchmark child failed:\n{proc.stderr or proc.stdout}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--llm", action="store_true", help="also time the first LLM-backed response (needs credentials)")
+    args = parser.parse_args()
+
+    runs = [run_once(args.llm) for _ in range(args.runs)]
+    timings = [key for key in runs[0] if key.endswith("_s")]
+    report = {
+        "runs": args.runs,
+        "median": {key: statistics.median(run[key] for run in runs) for key in timings},
+        "max": {key: max(run[key] for run in runs) for key in timings},
+        "heavy_sdks_loaded_before_llm": runs[0]["heavy_sdks_loaded_before_llm"],
+    }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+Local stand-in for the Gemini client so benchmarks run with no network.
+
+StubLLM mimics the `with_structured_output(...).invoke/ainvoke/batch` surface used by
+agent.py, sleeping for a configurable latency and deriving a UserIntent from the
+"User Request" line of the prompt. Prompts may be strings or (role, content) messages.
+"""
+import asyncio
+import re
+import time
+
+_REQUEST = re.compile(r'User Request: "(?P<text>.*)"')
+
+
+def prompt_text(prompt) -> str:
+    return prompt if isinstance(prompt, str) else "\n".join(content for _, content in prompt)
+
+
+class StubMessage:
+    def __init__(self, usage_metadata: dict, content: str = ""):
+        self.usage_metadata = usage_metadata
+        self.content = content
+
+
+class StubStructuredLLM:
+    def __init__(self, schema, latency_s: float, include_raw: bool = False):
+        self.schema = schema
+        self.latency_s = latency_s
+        self.include_raw = include_raw
+        self.calls = 0
+
+    def _output(self, prompt):
+        parsed = self._result(prompt)
+        if not self.include_raw:
+            return parsed
+        # Rough 4-characters-per-token estimate stands in for real usage metadata
+        usage = {"input_tokens": len(prompt_text(prompt)) // 4, "output_tokens": len(parsed.model_dump_json()) // 4}
+        return {"raw": StubMessage(usage), "parsed": parsed, "parsing_error": None}
+
+    def _result(self, prompt):
+        self.calls += 1
+        match = _REQUEST.search(prompt_text(prompt))
+        text = match.group("text") if match else ""
+        lowered = text.lower()
+        if lowered.startswith("add "):
+            return self.schema(intent="add_task", task_info={
+                "description": text[4:].strip().capitalize(),
+                "priority": 1 + len(text) % 5,
+                "estimated_time_minutes": 5 + (len(text) * 7) % 115,
+            })
+        if lowered.startswith("complete "):
+            return self.schema(intent="complete_task", task_description_to_complete=text[9:].strip())
+        return self.schema(intent="unknown")
+
+    def invoke(self, prompt):
+        time.sleep(self.latency_s)
+        return self._output(prompt)
+
+    async def ainvoke(self, prompt):
+        await asyncio.sleep(self.latency_s)
+        return self._output(prompt)
+
+    def batch(self, prompts, return_exceptions: bool = False):
+        # Calls in a batch run concurrently, so the batch costs one round trip
+        time.sleep(self.latency_s)
+        return [self._output(prompt) for prompt in prompts]
+
+
+class StubLLM:
+    def __init__(self, latency_ms: float = 0.0):
+        self.latency_s = latency_ms / 1000.0
+
+    def with_structured_output(self, schema, include_raw: bool = False):
+        return StubStructuredLLM(schema, self.latency_s, include_raw)
+
+    async def astream(self, prompt: str):
+        """Streams a canned free-text reply word by word, spreading the latency across chunks."""
+        words = "I can help with your tasks: add one, ask what to work on next, or plan your day.".split(" ")
+        for i, word in enumerate(words):
+            await asyncio.sleep(self.latency_s / len(words))
+            yield StubMessage({"input_tokens": len(prompt) // 4, "output_tokens": len(words)} if i == len(words) - 1 else None,
+                              content=word if i == 0 else " " + word)
@@ -1,6 +1,24 @@
-import React, { createContext, useContext, useState, useEffect } from 'react';
+import React, { createContext, useContext, useState, useEffect, useRef, useCallback } from 'react';
 import { Task, TaskContextType } from '../types';
 import { generateId, getTaskChoices as getChoices } from '../utils/taskUtils';
+import {
+  Mutation,
+  SyncDelta,
+  changedFields,
+  fetchDelta,
+  mergeDelta,
+  mutationTaskId,
+  pushMutations,
+  toWire
+} from '../utils/syncClient';
+
+// Set VITE_SYNC_URL to sync with the backend store; without it tasks stay in localStorage only
+const SYNC_URL = import.meta.env.VITE_SYNC_URL as string | undefined;
+const USER_ID = (import.meta.env.VITE_USER_ID as string | undefined) ?? 'default';
+const POLL_INTERVAL_MS = 15000;
+// Mutations made within this window go to the server in one request
+const FLUSH_DELAY_MS = 300;
+const PERSIST_DELAY_MS = 1000;
 
 const defaultTasks: Task[] = [
   {
@@ -55,15 +73,98 @@ const TaskContext = createContext<TaskContextType | undefined>(undefined);
 export const TaskProvider: React.FC<{ children: React.ReactNode }> = ({ children }) => {
   const [tasks, setTasks] = useState<Task[]>(() => {
     const storedTasks = localStorage.getItem('tasks');
-    return storedTasks ? JSON.parse(storedTasks) : defaultTasks;
+    if (storedTasks) return JSON.parse(storedTasks);
+    // With sync on, the server's list replaces the demo tasks on the first pull
+    return SYNC_URL ? [] : defaultTasks;
   });
   
   const [currentTask, setCurrentTask] = useState<Task | null>(null);
 
+  const tasksRef = useRef(tasks);
+  tasksRef.current = tasks;
+  const cursorRef = useRef<string | null>(localStorage.getItem('tasksCursor'));
+  const etagRef = useRef<string | null>(null);
+  const pendingRef = useRef<Mutation[]>([]);
+  const inFlightRef = useRef<Mutation[]>([]);
+  const flushTimerRef = useRef<ReturnType<typeof setTimeout> | null>(null);
+
+  // Writes are debounced so a burst of changes serializes the list once
   useEffect(() => {
-    localStorage.setItem('tasks', JSON.stringify(tasks));
+    const timer = setTimeout(() => localStorage.setItem('tasks', JSON.stringify(tasks)), PERSIST_DELAY_MS);
+    return () => clearTimeout(timer);
   }, [tasks]);
 
+  useEffect(() => {
+    const persistNow = () => localStorage.setItem('tasks', JSON.stringify(tasksRef.current));
+    window.addEventListener('pagehide', persistNow);
+    return () => window.removeEventListener('pagehide', persistNow);
+  }, []);
+
+  const applyDelta = useCallback((delta: SyncDelta, etag: string | null) => {
+    const pendingIds = new Set([...pendingRef.current, ...inFlightRef.current].map(mutationTaskId));
+    setTasks(prevTasks => mergeDelta(prevTasks, delta, pendingIds));
+    cursorRef.current = delta.cursor;
+    etagRef.current = etag;
+    localStorage.setItem('tasksCursor', delta.cursor);
+  }, []);
+
+  const pull = useCallback(async () => {
+    if (!SYNC_URL || inFlightRef.current.length) return;
+    try {
+      const result = await fetchDelta(SYNC_URL, USER_ID, cursorRef.current, etagRef.current);
+      if (result) applyDelta(result.delta, result.etag);
+    } catch (error) {
+      console.warn('Task sync failed, will retry', error);
+    }
+  }, [applyDelta]);
+
+  const flush = useCallback(async () => {
+    flushTimerRef.current = null;
+    if (!SYNC_URL || inFlightRef.current.length || !pendingRef.current.length) return;
+    inFlightRef.current = pendingRef.current;
+    pendingRef.current = [];
+    try {
+      const { response, etag } = await pushMutations(SYNC_URL, USER_ID, cursorRef.current, inFlightRef.current);
+      response.results
+        .filter(result => !result.ok)
+        .forEach(result => console.warn(`Task ${result.id} was rejected by the server: ${result.error}`));
+      inFlightRef.current = [];
+      applyDelta(response, etag);
+    } catch (error) {
+      // Mutations are idempotent, so the whole batch is simply resent
+      console.warn('Task sync failed, will retry', error);
+      pendingRef.current = [...inFlightRef.current, ...pendingRef.current];
+      inFlightRef.current = [];
+    }
+    if (pendingRef.current.length && !flushTimerRef.current) {
+      flushTimerRef.current = setTimeout(flush, FLUSH_DELAY_MS);
+    }
+  }, [applyDelta]);
+
+  const enqueue = useCallback((mutation: Mutation) => {
+    if (!SYNC_URL) return;
+    pendingRef.current.push(mutation);
+    if (!flushTimerRef.current) {
+      flushTimerRef.current = setTimeout(flush, FLUSH_DELAY_MS);
+    }
+  }, [flush]);
+
+  useEffect(() => {
+    if (!SYNC_URL) return;
+    // Tasks created before sync was turned on are uploaded once
+    if (!cursorRef.current) {
+      tasksRef.current.forEach(task => enqueue({ op: 'add', task: toWire(task) }));
+    }
+    pull();
+    const interval = setInterval(pull, POLL_INTERVAL_MS);
+    const onVisible = () => document.visibilityState === 'visible' && pull();
+    document.addEventListener('visibilitychange', onVisible);
+    return () => {
+      clearInterval(interval);
+      document.removeEventListener('visibilitychange', onVisible);
+    };
+  }, [enqueue, pull]);
+
   const addTask = (task: Omit<Task, 'id' | 'completed' | 'createdAt'>) => {
     const newTask: Task = {
       ...task,
@@ -73,9 +174,11 @@ export const TaskProvider: React.FC<{ children: React.ReactNode }> = ({ children
     };
     
     setTasks(prevTasks => [...prevTasks, newTask]);
+    enqueue({ op: 'add', task: toWire(newTask) });
   };
 
   const updateTask = (updatedTask: Task) => {
+    const previous = tasksRef.current.find(task => task.id === updatedTask.id);
     setTasks(prevTasks => 
       prevTasks.map(task => 
         task.id === updatedTask.id ? updatedTask : task
@@ -85,6 +188,16 @@ export const TaskProvider: React.FC<{ children: React.ReactNode }> = ({ children
     if (currentTask?.id === updatedTask.id) {
       setCurrentTask(updatedTask);
     }
+
+    if (previous) {
+      const fields = changedFields(previous, updatedTask);
+      const keys = Object.keys(fields);
+      if (keys.length === 1 && fields.completed === true) {
+        enqueue({ op: 'complete', id: updatedTask.id });
+      } else if (keys.length) {
+        enqueue({ op: 'edit', id: updatedTask.id, fields });
+      }
+    }
   };
 
   const deleteTask = (id: string) => {
@@ -93,6 +206,7 @@ export const TaskProvider: React.FC<{ children: React.ReactNode }> = ({ children
     if (currentTask?.id === id) {
       setCurrentTask(null);
     }
+    enqueue({ op: 'delete', id });
   };
 
   const getTaskChoices = () => {
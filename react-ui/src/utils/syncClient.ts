@@ -0,0 +1,140 @@
+import { Task } from '../types';
+
+// Task as stored by the backend (app/core Task)
+export interface WireTask {
+  id: string;
+  description: string;
+  priority: number; // 1 (highest) to 5 (lowest)
+  estimated_time_minutes: number;
+  added_at: string;
+  completed: boolean;
+  notes: string | null;
+}
+
+export type WireFields = Partial<Omit<WireTask, 'id' | 'added_at'>>;
+
+export type Mutation =
+  | { op: 'add'; task: WireTask }
+  | { op: 'complete'; id: string }
+  | { op: 'edit'; id: string; fields: WireFields }
+  | { op: 'delete'; id: string };
+
+export interface SyncDelta {
+  cursor: string;
+  reset: boolean;
+  tasks: WireTask[];
+  deleted: string[];
+}
+
+export interface SyncResponse extends SyncDelta {
+  results: { ok: boolean; id?: string; error?: string }[];
+}
+
+const PRIORITY_TO_WIRE: Record<Task['priority'], number> = { high: 1, medium: 3, low: 5 };
+
+export const priorityFromWire = (priority: number): Task['priority'] => {
+  if (priority <= 2) return 'high';
+  if (priority === 3) return 'medium';
+  return 'low';
+};
+
+// The UI's title is the backend's description; the UI's longer description is kept in notes
+export const toWire = (task: Task): WireTask => ({
+  id: task.id,
+  description: task.title,
+  priority: PRIORITY_TO_WIRE[task.priority],
+  estimated_time_minutes: task.timeAllocation,
+  added_at: new Date(task.createdAt).toISOString(),
+  completed: task.completed,
+  notes: task.description || null
+});
+
+export const fromWire = (task: WireTask): Task => ({
+  id: task.id,
+  title: task.description,
+  description: task.notes ?? '',
+  priority: priorityFromWire(task.priority),
+  timeAllocation: task.estimated_time_minutes,
+  completed: task.completed,
+  createdAt: new Date(task.added_at)
+});
+
+// Only the fields that changed, so editing a title doesn't round a backend priority of 2 to 1
+export const changedFields = (previous: Task, updated: Task): WireFields => {
+  const fields: WireFields = {};
+  if (previous.title !== updated.title) fields.description = updated.title;
+  if (previous.description !== updated.description) fields.notes = updated.description || null;
+  if (previous.priority !== updated.priority) fields.priority = PRIORITY_TO_WIRE[updated.priority];
+  if (previous.timeAllocation !== updated.timeAllocation) fields.estimated_time_minutes = updated.timeAllocation;
+  if (previous.completed !== updated.completed) fields.completed = updated.completed;
+  return fields;
+};
+
+/**
+ * Merges a server delta into the local list. Tasks with mutations the server hasn't
+ * acknowledged yet keep their local state so optimistic updates don't flicker back.
+ */
+export const mergeDelta = (tasks: Task[], delta: SyncDelta, pendingIds: Set<string>): Task[] => {
+  if (delta.reset) {
+    const serverIds = new Set(delta.tasks.map(task => task.id));
+    const localOnly = tasks.filter(task => pendingIds.has(task.id) && !serverIds.has(task.id));
+    const local = new Map(tasks.map(task => [task.id, task]));
+    return [
+      ...delta.tasks.map(task => (pendingIds.has(task.id) && local.get(task.id)) || fromWire(task)),
+      ...localOnly
+    ];
+  }
+  if (delta.tasks.length === 0 && delta.deleted.length === 0) {
+    return tasks;
+  }
+  const deleted = new Set(delta.deleted.filter(id => !pendingIds.has(id)));
+  const changed = new Map(
+    delta.tasks.filter(task => !pendingIds.has(task.id)).map(task => [task.id, fromWire(task)])
+  );
+  const merged = tasks
+    .filter(task => !deleted.has(task.id))
+    .map(task => {
+      const update = changed.get(task.id);
+      changed.delete(task.id);
+      return update ?? task;
+    });
+  return [...merged, ...changed.values()];
+};
+
+const tasksUrl = (baseUrl: string, userId: string) =>
+  `${baseUrl.replace(/\/$/, '')}/api/users/${encodeURIComponent(userId)}/tasks`;
+
+/** Changes since `cursor`, or null if nothing changed (the server answered 304 to our ETag). */
+export const fetchDelta = async (
+  baseUrl: string,
+  userId: string,
+  cursor: string | null,
+  etag: string | null
+): Promise<{ delta: SyncDelta; etag: string | null } | null> => {
+  const query = cursor ? `?since=${encodeURIComponent(cursor)}` : '';
+  const response = await fetch(tasksUrl(baseUrl, userId) + query, {
+    headers: etag && cursor ? { 'If-None-Match': etag } : {}
+  });
+  if (response.status === 304) return null;
+  if (!response.ok) throw new Error(`Sync failed: ${response.status}`);
+  return { delta: await response.json(), etag: response.headers.get('ETag') };
+};
+
+/** Sends a batch of mutations and returns their results plus everything changed since `cursor`. */
+export const pushMutations = async (
+  baseUrl: string,
+  userId: string,
+  cursor: string | null,
+  mutations: Mutation[]
+): Promise<{ response: SyncResponse; etag: string | null }> => {
+  const response = await fetch(`${tasksUrl(baseUrl, userId)}/sync`, {
+    method: 'POST',
+    headers: { 'Content-Type': 'application/json' },
+    body: JSON.stringify({ since: cursor, mutations })
+  });
+  if (!response.ok) throw new Error(`Sync failed: ${response.status}`);
+  return { response: await response.json(), etag: response.headers.get('ETag') };
+};
+
+export const mutationTaskId = (mutation: Mutation): string =>
+  mutation.op === 'add' ? mutation.task.id : mutation.id;
@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# The app imports its modules from app/ (e.g. `from core import ...`)
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "app"))
@@ -0,0 +1,110 @@
+from datetime import date, datetime
+
+from core import CalendarEvent, CalendarIndex, Journal, Task, TaskStore, load_calendar, load_task_records, save_calendar, save_tasks
+
+DAY = date(2025, 5, 12)
+
+
+def at(hour, minute=0):
+    return datetime(2025, 5, 12, hour, minute)
+
+
+def event(start, end, summary):
+    return CalendarEvent(start_time=start, end_time=end, summary=summary)
+
+
+def test_back_to_back_meetings_are_one_busy_block():
+    calendar = CalendarIndex([event(at(10), at(11), "Standup"), event(at(11), at(12), "Planning"),
+                              event(at(12), at(12, 30), "Review")])
+    assert calendar.busy_blocks() == [(at(10), at(12, 30), "Standup")]
+    free_from, next_block = calendar.free_window_at(at(10, 15))
+    assert free_from == at(12, 30)
+    assert next_block is None
+
+
+def test_nested_meeting_doesnt_end_the_block_early():
+    calendar = CalendarIndex([event(at(13), at(15), "Offsite"), event(at(13, 30), at(14), "Call")])
+    assert calendar.block_at(at(14, 30)) == (at(13), at(15), "Offsite")
+    assert calendar.free_window_at(at(13, 45))[0] == at(15)
+
+
+def test_event_bridging_two_blocks_merges_them():
+    calendar = CalendarIndex([event(at(9), at(10), "A"), event(at(11), at(12), "B")])
+    calendar.add(event(at(9, 30), at(11, 30), "Bridge"))
+    assert calendar.busy_blocks() == [(at(9), at(12), "A")]
+
+
+def test_free_windows_skip_busy_blocks():
+    calendar = CalendarIndex([event(at(10), at(11), "A"), event(at(10, 30), at(12), "B"), event(at(16), at(18), "C")])
+    assert calendar.free_windows(DAY) == [(at(9), at(10)), (at(12), at(16))]
+    assert calendar.free_windows(DAY, start=at(12, 30)) == [(at(12, 30), at(16))]
+
+
+def test_next_block_after_a_free_time():
+    calendar = CalendarIndex([event(at(10), at(11), "A"), event(at(14), at(15), "B")])
+    assert calendar.free_window_at(at(12)) == (at(12), (at(14), at(15), "B"))
+
+
+def test_remove_and_replace_rebuild_blocks():
+    meeting = event(at(10), at(11), "A")
+    calendar = CalendarIndex([meeting, event(at(11), at(12), "B")])
+    calendar.remove(meeting.id)
+    assert calendar.busy_blocks() == [(at(11), at(12), "B")]
+    calendar.add(meeting.model_copy(update={"start_time": at(9), "end_time": at(9, 30)}))
+    assert calendar.busy_blocks() == [(at(9), at(9, 30), "A"), (at(11), at(12), "B")]
+    assert len(calendar) == 2
+
+
+def test_save_calendar_goes_through_the_loaded_index(tmp_path):
+    journal = Journal(tmp_path, "calendar")
+    calendar = CalendarIndex(journal=journal)
+    changes = []
+    calendar.add_listener(lambda: changes.append(calendar.version))
+    standup = calendar.add(event(at(10), at(11), "Standup"))
+
+    save_calendar([standup, event(at(11), at(12), "Planning")], journal)
+    assert calendar.busy_blocks() == [(at(10), at(12), "Standup")]
+    assert changes == [1, 2]
+
+    # A later compaction snapshots the index, which now holds the saved events
+    journal.compact(journal.snapshot_source(), background=False)
+    journal.close()
+    assert sorted(e.summary for e in load_calendar(Journal(tmp_path, "calendar"))) == ["Planning", "Standup"]
+
+
+def test_save_calendar_removes_missing_events(tmp_path):
+    journal = Journal(tmp_path, "calendar")
+    calendar = CalendarIndex(journal=journal)
+    standup = calendar.add(event(at(10), at(11), "Standup"))
+    calendar.add(event(at(13), at(14), "Lunch"))
+
+    save_calendar([standup], journal)
+    assert calendar.busy_blocks() == [(at(10), at(11), "Standup")]
+    journal.close()
+    assert [e.summary for e in load_calendar(Journal(tmp_path, "calendar"))] == ["Standup"]
+
+
+def test_save_calendar_checkpoints_when_not_loaded(tmp_path):
+    save_calendar([event(at(10), at(11), "Standup")], Journal(tmp_path, "calendar"))
+    journal = Journal(tmp_path, "calendar")
+    assert journal.replay()[1] == []
+    assert [e.summary for e in load_calendar(journal)] == ["Standup"]
+
+
+def test_save_tasks_goes_through_the_loaded_store(tmp_path):
+    journal = Journal(tmp_path, "tasks")
+    store = TaskStore(journal=journal)
+    kept = store.add(Task(description="Write report", priority=2, estimated_time_minutes=60))
+    chore = store.add(Task(description="Old chore", priority=5, estimated_time_minutes=10))
+    version = store.version
+
+    new = Task(description="Call Bob", priority=1, estimated_time_minutes=15)
+    save_tasks([kept, new], journal)
+    assert sorted(task.description for task in store.active_tasks()) == ["Call Bob", "Write report"]
+    assert store.match_description("call bob").best.task_id == new.id
+    # Only the differences were applied: the unchanged task isn't in the sync history
+    assert sorted(store.changes_since(version)) == sorted([new.id, chore.id])
+
+    journal.compact(journal.snapshot_source(), background=False)
+    journal.close()
+    assert sorted(record["description"] for record in load_task_records(Journal(tmp_path, "tasks"))) == ["Call Bob", "Write report"]
@@ -0,0 +1,38 @@
+import asyncio
+import threading
+import time
+
+from core import Lazy
+
+
+def test_aget_builds_off_the_event_loop():
+    built_on = []
+
+    def slow_factory():
+        built_on.append(threading.current_thread())
+        time.sleep(0.2)
+        return "client"
+
+    lazy = Lazy(slow_factory)
+
+    async def main():
+        ticks = 0
+
+        async def tick():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        ticker = asyncio.create_task(tick())
+        value = await lazy.aget()
+        ticker.cancel()
+        return value, ticks
+
+    value, ticks = asyncio.run(main())
+    assert value == "client"
+    assert built_on != [threading.main_thread()]
+    # The loop kept running while the factory slept
+    assert ticks >= 5
+    assert asyncio.run(lazy.aget()) == "client"
+    assert len(built_on) == 1
@@ -0,0 +1,118 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from core import LLMDispatcher
+
+
+def test_aslot_shares_the_concurrency_cap():
+    dispatcher = LLMDispatcher(lambda: None, max_concurrency=2, rate_per_second=1e6)
+    peak = 0
+
+    async def stream():
+        nonlocal peak
+        async with dispatcher.aslot():
+            peak = max(peak, dispatcher.in_flight)
+            await asyncio.sleep(0.02)
+
+    async def main():
+        await asyncio.gather(*(stream() for _ in range(6)))
+
+    asyncio.run(main())
+    assert peak == 2
+    assert dispatcher.stats()["requests"] == 6
+    assert dispatcher.in_flight == 0
+
+
+def test_aslot_released_when_cancelled():
+    dispatcher = LLMDispatcher(lambda: None, max_concurrency=1, rate_per_second=1e6)
+
+    async def hold():
+        async with dispatcher.aslot():
+            await asyncio.sleep(10)
+
+    async def main():
+        task = asyncio.create_task(hold())
+        await asyncio.sleep(0.01)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        async with dispatcher.aslot():
+            pass
+
+    asyncio.run(asyncio.wait_for(main(), 1))
+    assert dispatcher.in_flight == 0
+
+
+class RateLimited(Exception):
+    status_code = 429
+
+
+class FlakyClient:
+    """Fails each prompt `failures` times with a 429, then echoes it; counts calls per prompt."""
+
+    def __init__(self, failures=0, delay=0.0):
+        self.failures = failures
+        self.delay = delay
+        self.calls = {}
+        self.lock = threading.Lock()
+
+    def invoke(self, prompt):
+        with self.lock:
+            self.calls[prompt] = self.calls.get(prompt, 0) + 1
+            attempt = self.calls[prompt]
+        time.sleep(self.delay)
+        if prompt == "bad":
+            raise ValueError("invalid request")
+        if attempt <= self.failures:
+            raise RateLimited()
+        return prompt.upper()
+
+
+def dispatcher_for(client, **kwargs):
+    return LLMDispatcher(lambda: client, rate_per_second=1e6, backoff_base=0.001, backoff_max=0.01, **kwargs)
+
+
+def test_rate_limited_calls_are_retried():
+    client = FlakyClient(failures=2)
+    dispatcher = dispatcher_for(client)
+    assert dispatcher.invoke("plan my day", timeout=5) == "PLAN MY DAY"
+    assert client.calls == {"plan my day": 3}
+    assert dispatcher.stats()["retries"] == 2
+    assert dispatcher.stats()["failures"] == 0
+    dispatcher.close()
+
+
+def test_retries_give_up_after_max_retries():
+    client = FlakyClient(failures=10)
+    dispatcher = dispatcher_for(client, max_retries=2)
+    with pytest.raises(RateLimited):
+        dispatcher.invoke("plan my day", timeout=5)
+    assert client.calls == {"plan my day": 3}
+    assert dispatcher.stats()["failures"] == 1
+    dispatcher.close()
+
+
+def test_non_retryable_errors_fail_immediately():
+    client = FlakyClient()
+    dispatcher = dispatcher_for(client)
+    with pytest.raises(ValueError):
+        dispatcher.invoke("bad", timeout=5)
+    assert client.calls == {"bad": 1}
+    assert dispatcher.stats()["retries"] == 0
+    dispatcher.close()
+
+
+def test_identical_pending_prompts_are_coalesced():
+    client = FlakyClient(delay=0.05)
+    dispatcher = dispatcher_for(client)
+    futures = [dispatcher.submit(prompt) for prompt in ["add milk"] * 5 + ["add eggs"] * 3]
+    assert [future.result(5) for future in futures] == ["ADD MILK"] * 5 + ["ADD EGGS"] * 3
+    assert client.calls == {"add milk": 1, "add eggs": 1}
+    assert dispatcher.stats()["coalesced"] == 6
+    assert dispatcher.stats()["requests"] == 2
+    # Once answered, the same prompt is sent again
+    assert dispatcher.invoke("add milk", timeout=5) == "ADD MILK"
+    assert client.calls["add milk"] == 2
+    dispatcher.close()
@@ -0,0 +1,85 @@
+import pytest
+
+from datetime import datetime
+
+from core import CalendarEvent, CalendarIndex, Journal, load_calendar
+
+
+class Crash(Exception):
+    pass
+
+
+def replayed_ids(directory):
+    records, ops = Journal(directory, "tasks").replay()
+    by_id = {record["id"]: record for record in records}
+    for op in ops:
+        by_id[op["id"]] = op
+    return sorted(by_id)
+
+
+def crash_mid_compaction(journal, records, monkeypatch):
+    """Compacts, dying at the first snapshot write, then drops the journal."""
+    def crash(records):
+        raise Crash()
+
+    with monkeypatch.context() as patch:
+        patch.setattr(journal, "_write_snapshot", crash)
+        with pytest.raises(Crash):
+            journal.compact(records, background=False)
+    journal.close()
+
+
+def test_replay_after_repeated_crashes_mid_compaction(tmp_path, monkeypatch):
+    journal = Journal(tmp_path, "tasks")
+    journal.append({"id": "A"})
+    journal.compact([{"id": "A"}], background=False)
+    journal.append({"id": "B"})
+    crash_mid_compaction(journal, [{"id": "A"}, {"id": "B"}], monkeypatch)
+
+    journal = Journal(tmp_path, "tasks")
+    assert replayed_ids(tmp_path) == ["A", "B"]
+    journal.append({"id": "C"})
+    crash_mid_compaction(journal, [{"id": "A"}, {"id": "B"}, {"id": "C"}], monkeypatch)
+
+    assert replayed_ids(tmp_path) == ["A", "B", "C"]
+
+
+def test_compaction_leaves_snapshot_only(tmp_path):
+    journal = Journal(tmp_path, "tasks")
+    journal.append({"id": "A"})
+    journal.compact([{"id": "A"}], background=True)
+    journal.close()
+
+    assert not journal.rotated_log_file.exists()
+    assert Journal(tmp_path, "tasks").replay() == ([{"id": "A"}], [])
+
+
+def test_calendar_replay_is_idempotent_after_crash_before_log_removal(tmp_path, monkeypatch):
+    journal = Journal(tmp_path, "calendar")
+    calendar = CalendarIndex(journal=journal)
+    calendar.add(CalendarEvent(start_time=datetime(2025, 5, 12, 9), end_time=datetime(2025, 5, 12, 9, 15), summary="standup"))
+
+    def snapshot_then_crash(records):
+        journal._write_snapshot(records)
+        raise Crash()
+
+    # The snapshot lands but the rotated log it covers is never removed
+    with monkeypatch.context() as patch:
+        patch.setattr(journal, "_finish_compaction", snapshot_then_crash)
+        with pytest.raises(Crash):
+            journal.compact(journal.snapshot_source(), background=False)
+    journal.close()
+
+    assert [event.summary for event in load_calendar(Journal(tmp_path, "calendar"))] == ["standup"]
+
+
+def test_calendar_records_without_ids_replay_once(tmp_path):
+    record = {"start_time": "2025-05-12T09:00:00", "end_time": "2025-05-12T09:15:00", "summary": "standup"}
+    journal = Journal(tmp_path, "calendar")
+    journal._write_snapshot([record])
+    journal.append({"op": "add", "event": record})
+    journal.close()
+
+    events = load_calendar(Journal(tmp_path, "calendar"))
+    assert [event.summary for event in events] == ["standup"]
+    assert events[0].id
@@ -0,0 +1,116 @@
+import random
+from datetime import datetime, timedelta
+
+import pytest
+
+import agent
+from core import CalendarEvent, CalendarIndex, Task, TaskStore, UserSession
+
+# Far enough ahead that the background refresher never reaches these boundaries during a test
+DAY = datetime(2030, 1, 7)
+
+
+def at(hour, minute=0, day=0):
+    return DAY + timedelta(days=day, hours=hour, minutes=minute)
+
+
+def session_with(tasks=(), events=()):
+    return UserSession("test", TaskStore(tasks), CalendarIndex(events))
+
+
+def cached(session, now):
+    with session.lock:
+        (slot_info, best_task), computed_at = agent._suggestion_cache(session).get(now)
+    return agent._slot_at(slot_info, computed_at, now), best_task
+
+
+def uncached(session, now):
+    (slot_info, best_task), _ = agent._plan_suggestion(session, now)
+    return slot_info, best_task
+
+
+def task(minutes, priority=3, description=None):
+    return Task(description=description or f"{minutes} min task", priority=priority, estimated_time_minutes=minutes)
+
+
+def test_served_from_cache_until_the_store_changes():
+    session = session_with([task(30)], [CalendarEvent(start_time=at(12), end_time=at(13), summary="Lunch")])
+    cache = agent._suggestion_cache(session)
+    _, best = cached(session, at(9))
+    assert best.estimated_time_minutes == 30
+    cached(session, at(9, 1))
+    assert (cache.hits, cache.misses) == (1, 1)
+
+    urgent = session.tasks.add(task(20, priority=1))
+    assert cached(session, at(9, 2))[1].id == urgent.id
+    assert cache.misses == 2
+
+    session.calendar.add(CalendarEvent(start_time=at(9, 10), end_time=at(12), summary="Workshop"))
+    slot_info, _ = cached(session, at(9, 3))
+    assert slot_info["free_until"] == at(9, 10)
+    assert cache.misses == 3
+
+
+def test_valid_until_tracks_the_shrinking_window():
+    session = session_with([task(45, priority=1), task(10, priority=2)],
+                           [CalendarEvent(start_time=at(11), end_time=at(12), summary="Review")])
+    _, valid_until = agent._plan_suggestion(session, at(10))
+    # The 45 min task stops fitting once less than 45 min is left before 11:00
+    assert valid_until == at(10, 15)
+    assert cached(session, at(10, 14))[1].estimated_time_minutes == 45
+    assert cached(session, at(10, 16))[1].estimated_time_minutes == 10
+    slot_info, _ = cached(session, at(10, 16))
+    assert slot_info["free_from"] == at(10, 16)
+    assert slot_info["free_duration_minutes"] == 44
+
+
+def test_valid_until_in_a_meeting_is_its_end():
+    session = session_with([task(30)], [CalendarEvent(start_time=at(10), end_time=at(11), summary="Standup"),
+                                        CalendarEvent(start_time=at(11), end_time=at(11, 30), summary="Sync")])
+    (slot_info, _), valid_until = agent._plan_suggestion(session, at(10, 20))
+    assert valid_until == slot_info["free_from"] == at(11, 30)
+    assert cached(session, at(11, 29)) == uncached(session, at(11, 29))
+
+
+def test_valid_until_after_hours_is_midnight():
+    session = session_with([task(30)])
+    (slot_info, best), valid_until = agent._plan_suggestion(session, at(18))
+    assert slot_info["free_duration_minutes"] == 0
+    assert valid_until == at(0, day=1)
+    assert cached(session, at(23, 59)) == uncached(session, at(23, 59))
+
+
+def test_too_little_time_is_valid_until_the_window_ends():
+    session = session_with([task(30)], [CalendarEvent(start_time=at(10, 3), end_time=at(11), summary="Call")])
+    (slot_info, best), valid_until = agent._plan_suggestion(session, at(10))
+    assert best is None
+    assert valid_until == at(10, 3)
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_matches_the_uncached_computation(seed):
+    rng = random.Random(seed)
+    events = []
+    for _ in range(rng.randint(0, 12)):
+        start = at(8) + timedelta(minutes=rng.randrange(0, 10 * 60, 5))
+        events.append(CalendarEvent(start_time=start, end_time=start + timedelta(minutes=rng.choice((5, 15, 30, 60, 90))),
+                                    summary=f"event {len(events)}"))
+    session = session_with([task(rng.choice((5, 10, 15, 30, 45, 60, 120)), rng.randint(1, 5), f"task {i}")
+                            for i in range(rng.randint(0, 15))], events)
+    now = at(7)
+    while now < at(21):
+        now += timedelta(minutes=rng.choice((0, 1, 2, 5, 13, 30)), seconds=rng.choice((0, 0, 30)))
+        change = rng.random()
+        with session.lock:
+            if change < 0.05:
+                session.tasks.add(task(rng.choice((5, 20, 40, 90)), rng.randint(1, 5)))
+            elif change < 0.08 and session.tasks.has_active():
+                session.tasks.complete(rng.choice(session.tasks.active_tasks()).id)
+            elif change < 0.1:
+                session.calendar.add(CalendarEvent(start_time=now + timedelta(minutes=rng.randint(-30, 120)),
+                                                   end_time=now + timedelta(minutes=rng.randint(121, 200)), summary="new"))
+        slot_info, best = cached(session, now)
+        expected_slot, expected_best = uncached(session, now)
+        assert slot_info == expected_slot, now
+        assert (best and best.id) == (expected_best and expected_best.id), now
+    assert agent._suggestion_cache(session).hits > 0
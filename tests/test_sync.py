@@ -0,0 +1,55 @@
+import http.client
+import json
+
+import pytest
+
+from core import UserRegistry, serve_sync
+
+UI_ORIGIN = "http://localhost:5173"
+
+
+@pytest.fixture
+def server(tmp_path):
+    registry = UserRegistry(directory=tmp_path)
+    server = serve_sync(registry, port=0, allowed_origin=UI_ORIGIN)
+    yield server
+    server.shutdown()
+    registry.close()
+
+
+def request(server, method, path, body=None, headers=None):
+    connection = http.client.HTTPConnection("127.0.0.1", server.server_port, timeout=5)
+    payload = body if isinstance(body, (bytes, type(None))) else json.dumps(body).encode()
+    connection.request(method, path, payload, headers or {})
+    response = connection.getresponse()
+    data = response.read()
+    connection.close()
+    return response.status, json.loads(data) if data else None
+
+
+def test_refuses_wildcard_origin(tmp_path):
+    with pytest.raises(ValueError):
+        serve_sync(UserRegistry(directory=tmp_path), port=0, allowed_origin="*")
+
+
+@pytest.mark.parametrize("method", ["GET", "POST", "OPTIONS"])
+def test_rejects_other_origins(server, method):
+    path = "/api/users/alice/tasks" + ("/sync" if method == "POST" else "")
+    status, _ = request(server, method, path, {"mutations": []} if method == "POST" else None,
+                        {"Origin": "https://evil.example", "Content-Type": "text/plain"})
+    assert status == 403
+
+
+@pytest.mark.parametrize("body", [[1, 2], "text", {"mutations": {}}, {"since": 5, "mutations": []}])
+def test_malformed_bodies_get_400(server, body):
+    status, payload = request(server, "POST", "/api/users/alice/tasks/sync", body)
+    assert status == 400 and "error" in payload
+
+
+def test_non_object_mutation_fails_on_its_own(server):
+    task = {"id": "t1", "description": "Water plants", "priority": 3, "estimated_time_minutes": 10}
+    status, payload = request(server, "POST", "/api/users/alice/tasks/sync",
+                              {"mutations": ["oops", {"op": "add", "task": task}]}, {"Origin": UI_ORIGIN})
+    assert status == 200
+    assert [result["ok"] for result in payload["results"]] == [False, True]
+    assert [task["id"] for task in payload["tasks"]] == ["t1"]
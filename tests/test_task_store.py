@@ -0,0 +1,185 @@
+import random
+from datetime import datetime, timedelta
+from itertools import count
+
+import pytest
+
+from core import Task, TaskStore, task_archive, task_store
+
+START = datetime(2025, 5, 12, 9)
+
+
+class NaiveStore:
+    """Every task in a dict, orderings computed by sorting on demand."""
+
+    def __init__(self):
+        self.tasks = {}
+        self._counter = count()
+
+    def put(self, task: Task):
+        old = self.tasks.get(task.id)
+        # Edits keep a task's place; new and reactivated tasks go to the end
+        keep_place = old is not None and (task.completed or not old["completed"])
+        seq = old["seq"] if keep_place else next(self._counter)
+        self.tasks[task.id] = {"task": task, "completed": task.completed, "seq": seq}
+
+    def delete(self, task_id: str):
+        self.tasks.pop(task_id, None)
+
+    def active(self):
+        return [entry for entry in self.tasks.values() if not entry["completed"]]
+
+    def by_added(self):
+        entries = sorted(self.active(), key=lambda e: (e["task"].priority, e["task"].added_at, e["seq"]))
+        return [entry["task"].id for entry in entries]
+
+    def by_estimate(self, max_minutes=None):
+        entries = sorted((e for e in self.active()
+                          if max_minutes is None or e["task"].estimated_time_minutes <= max_minutes),
+                         key=lambda e: (e["task"].priority, e["task"].estimated_time_minutes, e["seq"]))
+        return [entry["task"].id for entry in entries]
+
+    def best_fit(self, available_minutes):
+        fitting = self.by_estimate(available_minutes)
+        return fitting[0] if fitting else None
+
+    def in_order(self):
+        return [entry["task"].id for entry in sorted(self.tasks.values(), key=lambda e: e["seq"])]
+
+
+def random_task(rng, task_id=None):
+    fields = {"description": f"task {rng.randrange(1000)}", "priority": rng.randint(1, 5),
+              "estimated_time_minutes": rng.choice((5, 10, 15, 30, 45, 60, 90, 120)),
+              # Coarse timestamps so (priority, added_at) has plenty of ties
+              "added_at": START + timedelta(minutes=rng.randrange(0, 600, 30))}
+    return Task(**fields) if task_id is None else Task(id=task_id, **fields)
+
+
+def mutate(rng, store, model):
+    """Applies one random add/replace/complete/edit/delete/reactivate to both stores."""
+    ids = list(model.tasks)
+    choice = rng.random()
+    if choice < 0.4 or not ids:
+        task = random_task(rng)
+        if rng.random() < 0.1:
+            task.completed = True
+        store.add(task)
+        model.put(task)
+    elif choice < 0.55:
+        task = random_task(rng, rng.choice(ids))
+        store.add(task)
+        model.put(task)
+    elif choice < 0.75:
+        task_id = rng.choice(ids)
+        if store.complete(task_id) is not None:
+            model.put(model.tasks[task_id]["task"].model_copy(update={"completed": True}))
+    elif choice < 0.85:
+        task_id = rng.choice(ids)
+        fields = rng.choice(({"priority": rng.randint(1, 5)}, {"estimated_time_minutes": rng.choice((5, 25, 50))},
+                             {"completed": False}, {"completed": True}))
+        model.put(store.edit(task_id, **fields))
+    else:
+        task_id = rng.choice(ids)
+        store.delete(task_id)
+        model.delete(task_id)
+
+
+def assert_matches(store, model):
+    assert [task.id for task in store.active_tasks()] == model.by_added()
+    assert [row[0] for row in store.active_rows()] == model.by_added()
+    assert [task.id for task in store.active_by_priority()] == model.by_estimate()
+    for minutes in (0, 5, 20, 45, 200):
+        assert [task.id for task in store.iter_active_by_priority(minutes)] == model.by_estimate(minutes)
+        fit = store.best_fit(minutes)
+        assert (fit and fit.id) == model.best_fit(minutes)
+    assert store.active_count() == len(model.active())
+    assert len(store) == len(model.tasks)
+    assert [task.id for task in store] == model.in_order()
+    for task_id, entry in model.tasks.items():
+        task = store.get(task_id)
+        assert task.completed == entry["completed"]
+        assert (task.priority, task.estimated_time_minutes, task.added_at) == (
+            entry["task"].priority, entry["task"].estimated_time_minutes, entry["task"].added_at)
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_orderings_match_a_naive_model(seed):
+    rng = random.Random(seed)
+    store, model = TaskStore(), NaiveStore()
+    for step in range(400):
+        mutate(rng, store, model)
+        if step % 20 == 0:
+            assert_matches(store, model)
+    assert_matches(store, model)
+
+
+def test_best_fit_prefers_priority_then_the_shortest_estimate():
+    long_urgent = Task(description="Write report", priority=1, estimated_time_minutes=90)
+    short_urgent = Task(description="Reply to Ann", priority=1, estimated_time_minutes=10)
+    quick_chore = Task(description="Water plants", priority=4, estimated_time_minutes=5)
+    store = TaskStore([long_urgent, short_urgent, quick_chore])
+    assert store.best_fit(120).id == short_urgent.id
+    assert store.best_fit(9).id == quick_chore.id
+    assert store.best_fit(4) is None
+    store.complete(short_urgent.id)
+    assert store.best_fit(60).id == quick_chore.id
+    assert store.best_fit(90).id == long_urgent.id
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_compaction_and_archive_blocks_keep_the_store_consistent(seed, monkeypatch):
+    # Small thresholds so a short run compacts many times and spans many archive blocks
+    monkeypatch.setattr(task_store, "_COMPACT_MIN_DEAD", 8)
+    monkeypatch.setattr(task_archive, "BLOCK_SIZE", 4)
+    rng = random.Random(seed)
+    store, model = TaskStore(), NaiveStore()
+    for step in range(600):
+        mutate(rng, store, model)
+        if step % 25 == 0:
+            assert_matches(store, model)
+            assert store._dead < 8 or store._dead <= store.active_count()
+    assert_matches(store, model)
+    reloaded = TaskStore.from_records(store.records())
+    assert reloaded.records() == store.records()
+    assert_matches(reloaded, model)
+
+
+def test_completing_most_tasks_compacts_the_columns():
+    tasks = [Task(description=f"Task {i}", priority=i % 5 + 1, estimated_time_minutes=5 + i % 60,
+                  added_at=START + timedelta(seconds=i)) for i in range(1500)]
+    store = TaskStore(tasks)
+    for task in tasks[:1200]:
+        store.complete(task.id)
+    # 1200 tombstones outnumbered the 300 live rows, so they were dropped
+    assert len(store._ids) < 1500
+    assert store._dead < task_store._COMPACT_MIN_DEAD
+    assert [task.id for task in store] == [task.id for task in tasks]
+    assert [task.id for task in store.active_tasks()] == [
+        task.id for task in sorted(tasks[1200:], key=lambda t: (t.priority, t.added_at))]
+    fitting = [task for task in tasks[1200:] if task.estimated_time_minutes <= 20]
+    assert store.best_fit(20).id == min(fitting, key=lambda t: (t.priority, t.estimated_time_minutes)).id
+    assert store.match_description("Task 1499").best.task_id == tasks[1499].id
+    assert store.get(tasks[3].id).completed
+
+
+def test_archive_round_trips_across_blocks():
+    tasks = [Task(description=f"Done {i}", priority=3, estimated_time_minutes=15, notes="n" if i % 7 == 0 else None)
+             for i in range(task_archive.BLOCK_SIZE * 2 + 10)]
+    store = TaskStore(tasks)
+    for task in tasks:
+        store.complete(task.id)
+    assert store.completed_count() == len(tasks) and not store.has_active()
+    for task in (tasks[0], tasks[task_archive.BLOCK_SIZE], tasks[-1]):
+        assert store.get(task.id) == task.model_copy(update={"completed": True})
+
+    # Reactivating and deleting archived tasks leaves the rest of their blocks readable
+    reactivated = store.edit(tasks[1].id, completed=False)
+    store.delete(tasks[task_archive.BLOCK_SIZE + 1].id)
+    assert [task.id for task in store.active_tasks()] == [reactivated.id]
+    expected = [task.id for task in tasks if task.id != tasks[task_archive.BLOCK_SIZE + 1].id]
+    assert sorted(task.id for task in store) == sorted(expected)
+    assert store.completed_count() == len(expected) - 1
+
+    reloaded = TaskStore.from_records(store.records())
+    assert reloaded.records() == store.records()
+    assert reloaded.get(tasks[7].id).notes == "n"
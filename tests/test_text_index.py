@@ -0,0 +1,85 @@
+import random
+
+import pytest
+
+from core import TaskMatch, TaskTextIndex
+
+WORDS = ("review", "draft", "email", "report", "plan", "call", "fix", "update", "budget", "slides")
+
+
+def index_of(*descriptions, **kwargs):
+    index = TaskTextIndex(**kwargs)
+    for i, description in enumerate(descriptions):
+        index.add(f"t{i}", description)
+    return index
+
+
+@pytest.mark.parametrize("query", ["buy milk", "milk buy", "Buy MILK!"])
+def test_exact_words_win_over_longer_descriptions(query):
+    index = index_of("Buy milk", "Buy milk and eggs")
+    match = index.match(query)
+    assert not match.ambiguous
+    assert match.best.task_id == "t0"
+    assert match.best.score == 1.0
+
+
+def test_tighter_match_ranks_first():
+    index = index_of("Call the dentist about the appointment on Friday", "Call dentist", "Email landlord")
+    results = index.search("call dentist tomorrow")
+    assert [result.task_id for result in results[:2]] == ["t1", "t0"]
+    assert results[0].score > results[1].score
+
+
+def test_close_runner_up_is_ambiguous():
+    index = index_of("Send invoice to Acme", "Send invoice to Globex")
+    match = index.match("send invoice")
+    assert match.ambiguous
+    assert match.best is None
+    assert {candidate.task_id for candidate in match.candidates} == {"t0", "t1"}
+
+
+def test_margin_compares_with_tolerance():
+    # 0.9 - 0.8 is 0.0999... in floating point; a gap of exactly the margin is not ambiguous
+    index = index_of("a", "b", ambiguity_margin=0.1)
+    index.search = lambda query, limit=5: [TaskMatch(task_id="t0", description="a", score=0.9),
+                                           TaskMatch(task_id="t1", description="b", score=0.8)]
+    assert not index.match("anything").ambiguous
+
+
+@pytest.mark.parametrize("query", ["prepare quartely report", "prepar quarterly reprot"])
+def test_typos_still_match(query):
+    index = index_of("Prepare quarterly report", "Pay electricity bill", "Plan team offsite")
+    match = index.match(query)
+    assert match.best is not None and match.best.task_id == "t0"
+
+
+def test_no_match_below_min_score():
+    index = index_of("Prepare quarterly report")
+    assert index.match("walk the dog").best is None
+    assert index.search("walk the dog") == []
+
+
+def test_removed_tasks_are_not_matched():
+    index = index_of("Buy milk", "Buy milk today")
+    index.remove("t0")
+    assert index.match("buy milk").best.task_id == "t1"
+    index.remove("t1")
+    assert index.match("buy milk").candidates == []
+    assert len(index) == 0
+
+
+def test_re_adding_replaces_the_description():
+    index = index_of("Buy milk")
+    index.add("t0", "Walk the dog")
+    assert index.match("buy milk").best is None
+    assert index.match("walk dog").best.task_id == "t0"
+
+
+def test_common_words_rank_the_same_without_scoring_every_task():
+    rng = random.Random(7)
+    descriptions = [" ".join(rng.choices(WORDS, k=rng.randint(2, 4))) + f" #{i}" for i in range(3000)]
+    bounded = index_of(*descriptions, max_postings=16)
+    unbounded = index_of(*descriptions, max_postings=10 ** 9)
+    for _ in range(50):
+        query = " ".join(rng.sample(WORDS, rng.randint(1, 2)))
+        assert [result.score for result in bounded.search(query)] == [result.score for result in unbounded.search(query)]